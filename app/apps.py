@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app"
+
+    def ready(self):
+        import app.billing.checks  # noqa: F401
+        import app.billing.signals  # noqa: F401
+        import app.metrics  # noqa: F401
+        import app.users.signals  # noqa: F401
@@ -1,5 +1,12 @@
 from django.contrib import admin
-from app.billing.models import Plan, Subscription, Invoice, PaymentReminder
+from app.billing.models import (
+    Plan,
+    Subscription,
+    Invoice,
+    PaymentReminder,
+    StripeWebhookEvent,
+    ProcessedStripeEvent,
+)
 
 
 @admin.register(Plan)
@@ -57,3 +64,19 @@ class PaymentReminderAdmin(admin.ModelAdmin):
     list_filter = ("reminder_type", "email_sent")
     readonly_fields = ("id", "created_at")
     date_hierarchy = "sent_date"
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event_type", "received_at", "processed_at")
+    list_filter = ("event_type",)
+    search_fields = ("event_id",)
+    readonly_fields = ("id", "received_at")
+    date_hierarchy = "received_at"
+
+
+@admin.register(ProcessedStripeEvent)
+class ProcessedStripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "processed_at")
+    search_fields = ("event_id",)
+    date_hierarchy = "processed_at"
@@ -0,0 +1,138 @@
+from functools import wraps
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from app.billing import stripe_gateway
+from app.billing.customers import aensure_customer
+from app.billing.models import Invoice
+from app.billing.serializers import InvoiceSerializer
+from app.billing.dashboard import OPEN_INVOICE_STATUSES, aget_dashboard
+from app.users.authentication import arequest_user
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """
+    Render like the DRF views do, so both serving modes return the same bytes
+    """
+    return HttpResponse(
+        JSONRenderer().render(data), status=status, content_type="application/json"
+    )
+
+
+def async_login_required(view):
+    """
+    Token or session authentication for async views, like the DRF views,
+    passing the user to the view. The CSRF middleware is skipped, so token
+    clients can post, and the check applies to session users only.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await arequest_user(request)
+        except AuthenticationFailed as exc:
+            response = json_response(
+                {"detail": exc.detail}, status=status.HTTP_401_UNAUTHORIZED
+            )
+            response["WWW-Authenticate"] = "Bearer"
+            return response
+        except PermissionDenied as exc:
+            return json_response(
+                {"detail": exc.detail}, status=status.HTTP_403_FORBIDDEN
+            )
+        if not user.is_authenticated:
+            return json_response(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        return await view(request, user, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+async def get_user_invoice(queryset, invoice_id, user):
+    try:
+        return await queryset.aget(id=invoice_id, user=user)
+    except Invoice.DoesNotExist:
+        return None
+
+
+def invoice_not_found():
+    return json_response(
+        {"detail": "No Invoice matches the given query."},
+        status=status.HTTP_404_NOT_FOUND,
+    )
+
+
+@require_GET
+@async_login_required
+async def invoice_detail(request, user, invoice_id):
+    """
+    Get invoice details
+    """
+    invoice = await get_user_invoice(
+        InvoiceSerializer.setup_eager_loading(Invoice.objects.all()), invoice_id, user
+    )
+    if invoice is None:
+        return invoice_not_found()
+
+    return json_response(InvoiceSerializer(invoice).data)
+
+
+@require_POST
+@async_login_required
+async def create_stripe_payment_intent(request, user, invoice_id):
+    """
+    Create Stripe payment intent for invoice
+    """
+    invoice = await get_user_invoice(Invoice.objects.all(), invoice_id, user)
+    if invoice is None:
+        return invoice_not_found()
+
+    if invoice.status not in OPEN_INVOICE_STATUSES:
+        return json_response(
+            {"error": "Invoice cannot be paid"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        customer_id = await aensure_customer(user)
+
+        intent = await stripe_gateway.acreate_payment_intent(
+            amount=int(invoice.amount * 100),
+            currency="usd",
+            customer=customer_id,
+            metadata={"invoice_id": str(invoice.id), "user_id": str(user.id)},
+        )
+
+        invoice.payment_intent_id = intent["id"]
+        await invoice.asave(update_fields=["payment_intent_id", "updated_at"])
+
+        return json_response(
+            {
+                "client_secret": intent["client_secret"],
+                "payment_intent_id": intent["id"],
+            }
+        )
+
+    except stripe_gateway.CircuitOpenError:
+        return json_response(
+            {"error": "Payments are temporarily unavailable, please retry later"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    except stripe_gateway.StripeGatewayError as e:
+        return json_response(
+            {"error": f"Stripe error: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+@require_GET
+@async_login_required
+async def billing_dashboard(request, user):
+    """
+    Get user's billing dashboard data
+    """
+    return json_response(await aget_dashboard(user))
@@ -0,0 +1,87 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from app.db_router import read_from_primary
+
+
+CATALOG_VERSION_KEY = "billing:plan_catalog:version"
+
+
+class PlanCatalog:
+    """
+    Process-local cache of the rendered plan catalog.
+
+    The cached JSON body is tagged with a version stamp shared through the
+    Django cache and bumped whenever a Plan is saved or deleted. The stamp is
+    re-read at most every PLAN_CATALOG_CHECK_INTERVAL seconds, so most
+    requests are answered without leaving the process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entry = None
+        self.checked_at = 0.0
+
+    def current_version(self):
+        version = cache.get(CATALOG_VERSION_KEY)
+        if version is None:
+            cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(CATALOG_VERSION_KEY)
+        return version
+
+    def get(self, render):
+        """
+        Return the cached catalog entry, calling `render` for fresh JSON bytes
+        when the version stamp has moved
+        """
+        now = time.monotonic()
+        entry = self.entry
+        if (
+            entry is not None
+            and now - self.checked_at < settings.PLAN_CATALOG_CHECK_INTERVAL
+        ):
+            return entry
+
+        version = self.current_version()
+        with self.lock:
+            if self.entry is None or self.entry["version"] != version:
+                # Rendered right after a plan change bumped the version, and
+                # kept until the next one
+                with read_from_primary():
+                    body = render()
+                self.entry = {
+                    "version": version,
+                    "body": body,
+                    "etag": quote_etag(str(version)),
+                    "last_modified": version // 1_000_000_000,
+                }
+            self.checked_at = now
+            return self.entry
+
+    def invalidate(self):
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+        self.entry = None
+
+
+def is_not_modified(request, entry):
+    """
+    Evaluate If-None-Match / If-Modified-Since against a catalog entry
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return "*" in etags or entry["etag"] in etags
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since"))
+    return if_modified_since is not None and entry["last_modified"] <= if_modified_since
+
+
+def set_validators(response, entry):
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    return response
+
+
+plan_catalog = PlanCatalog()
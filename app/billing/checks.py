@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_stripe_webhook_secret(app_configs, **kwargs):
+    """
+    Without STRIPE_WEBHOOK_SECRET the webhook endpoint refuses every event
+    """
+    if settings.STRIPE_WEBHOOK_SECRET:
+        return []
+    return [
+        Warning(
+            "STRIPE_WEBHOOK_SECRET is not set, so Stripe webhooks are refused.",
+            hint="Set it to the signing secret of the Stripe webhook endpoint.",
+            id="billing.W001",
+        )
+    ]
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from app.logger import get_logger
+from app.users.models import User
+from app.billing import stripe_gateway
+
+
+logger = get_logger(__name__)
+
+
+def customer_idempotency_key(user_id):
+    """
+    Stripe replays the first response to a repeated idempotency key, so every
+    creation attempt for a user (job, retry or payment fallback) returns the
+    same customer
+    """
+    return f"customer-create-{user_id}"
+
+
+def provisioning_lock_key(user_id):
+    return f"billing:stripe_customer_lock:{user_id}"
+
+
+def customer_kwargs(user):
+    return {
+        "email": user.email,
+        "name": user.username,
+        "metadata": {"user_id": str(user.id)},
+        "idempotency_key": customer_idempotency_key(user.id),
+    }
+
+
+def ensure_customer(user):
+    """
+    Return the Stripe customer id of a user, creating the customer inline
+    when the provisioning job has not done it yet
+    """
+    if not user.stripe_customer_id:
+        customer = stripe_gateway.create_customer(**customer_kwargs(user))
+        user.stripe_customer_id = customer["id"]
+        user.save(update_fields=["stripe_customer_id", "updated_at"])
+    return user.stripe_customer_id
+
+
+async def aensure_customer(user):
+    """
+    Async version of ensure_customer
+    """
+    if not user.stripe_customer_id:
+        customer = await stripe_gateway.acreate_customer(**customer_kwargs(user))
+        user.stripe_customer_id = customer["id"]
+        await user.asave(update_fields=["stripe_customer_id", "updated_at"])
+    return user.stripe_customer_id
+
+
+def create_customer(user):
+    try:
+        return stripe_gateway.create_customer(**customer_kwargs(user))["id"]
+    except stripe_gateway.CircuitOpenError:
+        return None
+    except stripe_gateway.StripeGatewayError as e:
+        logger.error("Could not create a Stripe customer for user %s: %s", user.id, e)
+        return None
+
+
+def provision_customers(user_ids=None, batch_size=None):
+    """
+    Create the Stripe customers of users that have none, in batches with
+    STRIPE_PROVISION_CONCURRENCY calls in flight. Each user is claimed in the
+    cache first so a user is only provisioned by one worker at a time.
+    """
+    batch_size = batch_size or settings.STRIPE_PROVISION_BATCH_SIZE
+    users = User.objects.filter(stripe_customer_id="").only("id", "email", "username")
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+
+    provisioned, failed, last_id = 0, 0, 0
+    with ThreadPoolExecutor(settings.STRIPE_PROVISION_CONCURRENCY) as executor:
+        while True:
+            batch = list(users.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            claimed = [
+                user
+                for user in batch
+                if cache.add(
+                    provisioning_lock_key(user.id),
+                    True,
+                    settings.STRIPE_PROVISION_LOCK_TIMEOUT,
+                )
+            ]
+            try:
+                now = timezone.now()
+                created = []
+                for user, customer_id in zip(
+                    claimed, executor.map(create_customer, claimed)
+                ):
+                    if customer_id is None:
+                        continue
+                    user.stripe_customer_id = customer_id
+                    user.updated_at = now
+                    created.append(user)
+
+                User.objects.bulk_update(created, ["stripe_customer_id", "updated_at"])
+                provisioned += len(created)
+                failed += len(claimed) - len(created)
+            finally:
+                cache.delete_many([provisioning_lock_key(user.id) for user in claimed])
+
+    if provisioned or failed:
+        logger.info(
+            "Provisioned %d Stripe customers, %d failed (circuit %s)",
+            provisioned,
+            failed,
+            stripe_gateway.breaker.state,
+        )
+    return provisioned
@@ -0,0 +1,83 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from app.db_router import read_from_primary
+from app.billing.models import Subscription, Invoice
+from app.billing.serializers import SubscriptionSerializer, InvoiceSerializer
+
+
+OPEN_INVOICE_STATUSES = ["pending", "overdue"]
+
+
+def dashboard_cache_key(user_id):
+    return f"billing:dashboard:{user_id}"
+
+
+@read_from_primary()
+def build_dashboard(user):
+    """
+    Build the billing dashboard with a fixed number of queries
+    """
+    active_subscription = SubscriptionSerializer.setup_eager_loading(
+        Subscription.objects.filter(user=user, status="active")
+    ).first()
+
+    totals = Invoice.objects.filter(user=user).aggregate(
+        total_owed=Sum("amount", filter=Q(status__in=OPEN_INVOICE_STATUSES)),
+        pending_count=Count("id", filter=Q(status__in=OPEN_INVOICE_STATUSES)),
+    )
+
+    recent_invoices = InvoiceSerializer.setup_eager_loading(
+        Invoice.objects.filter(user=user)
+    ).order_by("-created_at")[:5]
+
+    pending_invoices = InvoiceSerializer.setup_eager_loading(
+        Invoice.objects.filter(user=user, status__in=OPEN_INVOICE_STATUSES)
+    ).order_by("due_date")[: settings.DASHBOARD_PENDING_INVOICES_LIMIT]
+
+    return {
+        "active_subscription": (
+            SubscriptionSerializer(active_subscription).data
+            if active_subscription
+            else None
+        ),
+        "recent_invoices": InvoiceSerializer(recent_invoices, many=True).data,
+        "pending_invoices": InvoiceSerializer(pending_invoices, many=True).data,
+        "pending_invoices_count": totals["pending_count"],
+        "total_owed": totals["total_owed"] or 0,
+        "next_billing_date": (
+            active_subscription.next_billing_date if active_subscription else None
+        ),
+    }
+
+
+def get_dashboard(user):
+    """
+    Return the billing dashboard of a user from the cache, building it on a miss
+    """
+    key = dashboard_cache_key(user.id)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, settings.DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
+
+
+async def aget_dashboard(user):
+    """
+    Async version of get_dashboard
+    """
+    key = dashboard_cache_key(user.id)
+    dashboard = await cache.aget(key)
+    if dashboard is None:
+        dashboard = await sync_to_async(build_dashboard)(user)
+        await cache.aset(key, dashboard, settings.DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
+
+
+def invalidate_dashboards(user_ids):
+    """
+    Drop the cached dashboards of the given users
+    """
+    cache.delete_many([dashboard_cache_key(user_id) for user_id in set(user_ids)])
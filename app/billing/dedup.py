@@ -0,0 +1,107 @@
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from app.logger import get_logger
+from app.local_cache import CacheCounters
+from app.billing.models import StripeWebhookEvent, ProcessedStripeEvent
+
+
+logger = get_logger(__name__)
+
+
+class RecentEventCache:
+    """
+    Bounded LRU of recently seen Stripe event ids. Exact membership, so a hit
+    can reject a re-delivered event without any ORM work.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def __contains__(self, event_id):
+        with self.lock:
+            if event_id in self.entries:
+                self.entries.move_to_end(event_id)
+                return True
+            return False
+
+    def add(self, event_id):
+        with self.lock:
+            self.entries[event_id] = None
+            self.entries.move_to_end(event_id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+recent_events = RecentEventCache(settings.STRIPE_EVENT_LRU_SIZE)
+dedup_metrics = CacheCounters(hits=("lru_hits", "store_hits"))
+
+
+def is_recent_duplicate(event_id):
+    """
+    O(1) front check used at intake before the event is written anywhere.
+    Ids are only remembered once stored, so a failed write is not masked.
+    """
+    duplicate = event_id in recent_events
+    if duplicate:
+        dedup_metrics.record("lru_hits")
+    return duplicate
+
+
+def claim_events(event_ids):
+    """
+    Record event ids in the processed-event store and return the ones this
+    caller claimed. The primary key on event_id is the authority: ids already
+    present, or inserted concurrently by another consumer, are not returned.
+    """
+    event_ids = set(event_ids)
+    if not event_ids:
+        return set()
+
+    batch_token = uuid.uuid4()
+    ProcessedStripeEvent.objects.bulk_create(
+        [
+            ProcessedStripeEvent(event_id=event_id, batch_token=batch_token)
+            for event_id in event_ids
+        ],
+        ignore_conflicts=True,
+    )
+    claimed = set(
+        ProcessedStripeEvent.objects.filter(
+            event_id__in=event_ids, batch_token=batch_token
+        ).values_list("event_id", flat=True)
+    )
+
+    dedup_metrics.record("misses", len(claimed))
+    dedup_metrics.record("store_hits", len(event_ids) - len(claimed))
+    for event_id in claimed:
+        recent_events.add(event_id)
+    return claimed
+
+
+def purge_expired_events(batch_size=None):
+    """
+    Delete processed-event records and processed inbox rows older than
+    STRIPE_EVENT_DEDUP_TTL, in batches
+    """
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(seconds=settings.STRIPE_EVENT_DEDUP_TTL)
+    purged = 0
+
+    for queryset in (
+        ProcessedStripeEvent.objects.filter(processed_at__lt=cutoff),
+        StripeWebhookEvent.objects.filter(processed_at__lt=cutoff),
+    ):
+        while True:
+            pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            purged += queryset.model.objects.filter(pk__in=pks).delete()[0]
+
+    logger.info("Purged %d expired Stripe event records", purged)
+    return purged
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from app.db_router import read_from_primary
+from app.local_cache import CacheCounters, LocalTTLCache
+from app.billing.models import Subscription
+
+
+local_entitlements = LocalTTLCache(
+    settings.ENTITLEMENT_LRU_SIZE, settings.ENTITLEMENT_LOCAL_TTL
+)
+entitlement_metrics = CacheCounters(hits=("local_hits", "shared_hits"))
+
+
+def entitlement_cache_key(user_id):
+    return f"billing:entitlement:{user_id}"
+
+
+@read_from_primary()
+def build_entitlement(user_id):
+    """
+    Resolve the active plan of a user and the features it grants
+    """
+    subscription = (
+        Subscription.objects.filter(user_id=user_id, status="active")
+        .select_related("plan")
+        .only(
+            "id",
+            "status",
+            "end_date",
+            "plan__id",
+            "plan__name",
+            "plan__plan_type",
+            "plan__features",
+        )
+        .first()
+    )
+    if subscription is None or not subscription.is_active():
+        return {"user_id": user_id, "active": False, "plan": None, "features": []}
+
+    return {
+        "user_id": user_id,
+        "active": True,
+        "subscription_id": str(subscription.id),
+        "plan": {
+            "id": str(subscription.plan.id),
+            "name": subscription.plan.name,
+            "plan_type": subscription.plan.plan_type,
+        },
+        "features": list(subscription.plan.features),
+        "end_date": subscription.end_date,
+    }
+
+
+def entitlement_timeout(entitlement):
+    """
+    Shared cache timeout, cut short when the subscription ends sooner
+    """
+    timeout = settings.ENTITLEMENT_CACHE_TIMEOUT
+    end_date = entitlement.get("end_date")
+    if end_date is not None:
+        timeout = min(timeout, int((end_date - timezone.now()).total_seconds()))
+    return max(timeout, 1)
+
+
+def get_entitlement(user_id):
+    """
+    Return the entitlement of a user from the local LRU, then the shared
+    cache, building it from the database on a miss
+    """
+    key = entitlement_cache_key(user_id)
+    entitlement = local_entitlements.get(key)
+    if entitlement is not None:
+        entitlement_metrics.record("local_hits")
+        return entitlement
+
+    entitlement = cache.get(key)
+    if entitlement is not None:
+        entitlement_metrics.record("shared_hits")
+    else:
+        entitlement_metrics.record("misses")
+        entitlement = build_entitlement(user_id)
+        cache.set(key, entitlement, entitlement_timeout(entitlement))
+
+    local_entitlements.set(key, entitlement)
+    return entitlement
+
+
+def invalidate_entitlements(user_ids):
+    """
+    Drop the cached entitlements of the given users from both levels
+    """
+    keys = [entitlement_cache_key(user_id) for user_id in set(user_ids)]
+    local_entitlements.delete_many(keys)
+    cache.delete_many(keys)
+
+
+def invalidate_plan_entitlements(plan_id, batch_size=1000):
+    """
+    Drop the cached entitlements of every active subscriber of a plan
+    """
+    local_entitlements.clear()
+    user_ids = (
+        Subscription.objects.filter(plan_id=plan_id, status="active")
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    batch = []
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            invalidate_entitlements(batch)
+            batch = []
+    if batch:
+        invalidate_entitlements(batch)
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from app.logger import get_logger
+from app.billing.models import Subscription, Invoice
+from app.billing.dashboard import invalidate_dashboards
+
+
+logger = get_logger(__name__)
+
+
+BILLING_CYCLE_DAYS = {
+    "monthly": 30,
+    "yearly": 365,
+}
+
+
+def day_bounds(day):
+    """
+    Half-open [start, end) datetime range of `day` in the current timezone, so
+    date filters stay sargable against the datetime indexes
+    """
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+
+def due_subscriptions(day, shard=None):
+    """
+    Active subscriptions billed on `day` that have no invoice issued that day yet,
+    optionally restricted to a shard filter
+    """
+    start, end = day_bounds(day)
+    invoiced_today = Invoice.objects.filter(
+        subscription=OuterRef("pk"),
+        issue_date__gte=start,
+        issue_date__lt=end,
+    )
+    subscriptions = Subscription.objects.filter(
+        status="active",
+        next_billing_date__gte=start,
+        next_billing_date__lt=end,
+    )
+    if shard is not None:
+        subscriptions = subscriptions.filter(shard)
+    return (
+        subscriptions.filter(~Exists(invoiced_today))
+        .select_related("plan")
+        .only(
+            "id",
+            "user_id",
+            "plan_id",
+            "next_billing_date",
+            "plan__price",
+            "plan__billing_cycle",
+        )
+        .order_by("id")
+    )
+
+
+def bill_chunk(subscriptions, now):
+    """
+    Create invoices for a chunk of subscriptions and advance their billing date
+    """
+    invoices = []
+    for subscription in subscriptions:
+        invoices.append(
+            Invoice(
+                user_id=subscription.user_id,
+                subscription_id=subscription.id,
+                plan_id=subscription.plan_id,
+                amount=subscription.plan.price,
+                issue_date=now,
+                due_date=now + timedelta(days=30),
+            )
+        )
+        subscription.next_billing_date += timedelta(
+            days=BILLING_CYCLE_DAYS.get(subscription.plan.billing_cycle, 365)
+        )
+        subscription.updated_at = now
+
+    Invoice.objects.bulk_create(invoices)
+    Subscription.objects.bulk_update(subscriptions, ["next_billing_date", "updated_at"])
+    transaction.on_commit(
+        lambda: invalidate_dashboards(invoice.user_id for invoice in invoices)
+    )
+    return len(invoices)
+
+
+def generate_due_invoices(day=None, chunk_size=None, shard=None):
+    """
+    Generate invoices for every subscription due on `day`.
+
+    Due subscriptions are walked in keyset-paginated chunks ordered by id and
+    each chunk is billed in its own transaction with one insert and one update.
+    """
+    day = day or timezone.now().date()
+    chunk_size = chunk_size or settings.BILLING_CHUNK_SIZE
+    queryset = due_subscriptions(day, shard)
+
+    started = time.monotonic()
+    invoices_created = 0
+    chunks = 0
+    last_id = None
+
+    while True:
+        with transaction.atomic():
+            page = queryset.select_for_update(of=("self",))
+            if last_id is not None:
+                page = page.filter(id__gt=last_id)
+            subscriptions = list(page[:chunk_size])
+            if not subscriptions:
+                break
+
+            invoices_created += bill_chunk(subscriptions, timezone.now())
+
+        chunks += 1
+        last_id = subscriptions[-1].id
+        logger.debug("Billed chunk %d (%d subscriptions)", chunks, len(subscriptions))
+
+    elapsed = time.monotonic() - started
+    rows_per_second = invoices_created / elapsed if elapsed else 0.0
+    logger.info(
+        "Generated %d invoices in %d chunks (%.2fs, %.0f rows/s)",
+        invoices_created,
+        chunks,
+        elapsed,
+        rows_per_second,
+    )
+
+    return {
+        "invoices_created": invoices_created,
+        "chunks": chunks,
+        "elapsed": elapsed,
+        "rows_per_second": rows_per_second,
+    }
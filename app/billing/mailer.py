@@ -0,0 +1,117 @@
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import get_template
+from app.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class EmailConnectionPool:
+    """
+    Keeps one open email backend connection per process and hands it out for
+    whole batches, so SMTP sessions are reused across messages and tasks.
+    Connections are recycled after EMAIL_CONNECTION_MAX_AGE seconds or on error.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.backend = None
+        self.opened_at = 0.0
+
+    @contextmanager
+    def connection(self):
+        with self.lock:
+            if (
+                self.backend is not None
+                and time.monotonic() - self.opened_at
+                > settings.EMAIL_CONNECTION_MAX_AGE
+            ):
+                self.close()
+            if self.backend is None:
+                self.backend = get_connection(fail_silently=False)
+                self.backend.open()
+                self.opened_at = time.monotonic()
+
+            try:
+                yield self.backend
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self.close()
+                raise
+
+    def close(self):
+        if self.backend is not None:
+            try:
+                self.backend.close()
+            finally:
+                self.backend = None
+
+
+connection_pool = EmailConnectionPool()
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template(template_name):
+    """
+    Load and compile a template once per process
+    """
+    return get_template(template_name)
+
+
+def build_payment_reminder_email(invoice):
+    body = get_compiled_template("billing/payment_reminder_email.txt").render(
+        {"invoice": invoice}
+    )
+    return EmailMessage(
+        subject=f"Payment Reminder - Invoice {invoice.id}",
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[invoice.user.email],
+    )
+
+
+def send_batched(messages):
+    """
+    Send (key, EmailMessage) pairs over the pooled connection in batches of
+    EMAIL_BATCH_SIZE, throttled to EMAIL_RATE_LIMIT messages per second.
+    Returns the keys of the messages that were delivered; a broken connection
+    abandons the rest of its batch and the next batch reconnects.
+    """
+    batch_size = settings.EMAIL_BATCH_SIZE
+    rate_limit = settings.EMAIL_RATE_LIMIT
+    delivered = []
+    started = time.monotonic()
+
+    for offset in range(0, len(messages), batch_size):
+        batch = messages[offset : offset + batch_size]
+        batch_started = time.monotonic()
+
+        try:
+            with connection_pool.connection() as connection:
+                for key, message in batch:
+                    try:
+                        connection.send_messages([message])
+                        delivered.append(key)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        logger.error("Failed to send email %s: %s", key, e)
+        except (smtplib.SMTPException, OSError) as e:
+            logger.error("Email batch failed, connection dropped: %s", e)
+
+        if rate_limit:
+            remaining = len(batch) / rate_limit - (time.monotonic() - batch_started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        "Delivered %d of %d emails (%.0f msg/s)",
+        len(delivered),
+        len(messages),
+        len(delivered) / elapsed if elapsed else 0,
+    )
+    return delivered
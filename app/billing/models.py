@@ -83,6 +83,27 @@ class Subscription(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "next_billing_date"], name="sub_status_billing_idx"
+            ),
+            models.Index(fields=["user", "status"], name="sub_user_status_idx"),
+            models.Index(
+                fields=["user", "created_at", "id"], name="sub_user_created_idx"
+            ),
+            models.Index(
+                fields=["stripe_subscription_id"],
+                name="sub_stripe_id_idx",
+                condition=~models.Q(stripe_subscription_id=""),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"],
+                name="sub_one_active_per_user",
+                condition=models.Q(status="active"),
+            ),
+        ]
 
 
 class Invoice(models.Model):
@@ -132,6 +153,25 @@ class Invoice(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "status"], name="invoice_user_status_idx"),
+            models.Index(
+                fields=["user", "created_at", "id"], name="invoice_user_created_idx"
+            ),
+            models.Index(
+                fields=["status", "due_date"],
+                name="invoice_open_due_date_idx",
+                condition=models.Q(status__in=["pending", "overdue"]),
+            ),
+            models.Index(
+                fields=["subscription", "issue_date"], name="invoice_sub_issue_idx"
+            ),
+            models.Index(
+                fields=["stripe_invoice_id"],
+                name="invoice_stripe_id_idx",
+                condition=~models.Q(stripe_invoice_id=""),
+            ),
+        ]
 
 
 class PaymentReminder(models.Model):
@@ -148,3 +188,53 @@ class PaymentReminder(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["invoice", "sent_date"], name="reminder_invoice_sent_idx"
+            ),
+        ]
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    Durable inbox of verified Stripe webhook events awaiting batch processing
+    """
+
+    event_id = models.CharField(max_length=255, db_index=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="webhook_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+            models.Index(
+                fields=["processed_at"],
+                name="webhook_processed_at_idx",
+                condition=models.Q(processed_at__isnull=False),
+            ),
+        ]
+
+
+class ProcessedStripeEvent(models.Model):
+    """
+    Authoritative record of Stripe event ids that have already been applied
+    """
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    batch_token = models.UUIDField()
+    processed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.event_id
@@ -0,0 +1,112 @@
+import uuid
+from base64 import b64decode, b64encode
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    Pages are fetched by seeking past the last seen position instead of
+    OFFSET, so a deep page costs the same as the first one.
+    The total count is included unless the client passes `count=false`.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, "true").lower() != "false":
+            self.count = queryset.count()
+
+        reverse = cursor is not None and cursor["reverse"]
+        if cursor is not None:
+            queryset = queryset.filter(self.position_filter(cursor))
+        if reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by("-created_at", "-id")
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = rows
+        return rows
+
+    def position_filter(self, cursor):
+        """
+        Rows past the cursor. The OR alone is no range on the (user,
+        created_at, id) indexes, so the created_at bound is added for Postgres
+        to start the index scan at the cursor.
+        """
+        created_at, pk = cursor["created_at"], cursor["id"]
+        if cursor["reverse"]:
+            return Q(created_at__gte=created_at) & (
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+        return Q(created_at__lte=created_at) & (
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            direction, created_at, pk = (
+                b64decode(encoded.encode("ascii")).decode("ascii").split("|")
+            )
+            return {
+                "reverse": direction == "p",
+                "created_at": datetime.fromisoformat(created_at),
+                "id": uuid.UUID(pk),
+            }
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        position = f"{'p' if reverse else 'n'}|{row.created_at.isoformat()}|{row.id}"
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            b64encode(position.encode("ascii")).decode("ascii"),
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
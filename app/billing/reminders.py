@@ -0,0 +1,91 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from app.logger import get_logger
+from app.billing.models import Invoice, PaymentReminder
+from app.billing.invoicing import day_bounds
+from app.billing.mailer import build_payment_reminder_email, send_batched
+
+
+logger = get_logger(__name__)
+
+
+def invoices_needing_reminder(day, shard=None):
+    """
+    Overdue invoices that have not been reminded on `day`, optionally
+    restricted to a shard filter
+    """
+    start, end = day_bounds(day)
+    reminded_today = PaymentReminder.objects.filter(
+        invoice=OuterRef("pk"),
+        sent_date__gte=start,
+        sent_date__lt=end,
+    )
+    invoices = Invoice.objects.filter(status="overdue")
+    if shard is not None:
+        invoices = invoices.filter(shard)
+    return invoices.filter(~Exists(reminded_today)).order_by("id")
+
+
+def create_due_reminders(day=None, batch_size=None, shard=None, dispatch=None):
+    """
+    Create today's reminders for overdue invoices in keyset-paginated batches.
+
+    Each batch is inserted with one bulk_create and its reminder ids are
+    handed to `dispatch` (the email delivery stage) once committed.
+    """
+    day = day or timezone.now().date()
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    dispatch = dispatch or deliver_reminders
+    queryset = invoices_needing_reminder(day, shard)
+
+    started = time.monotonic()
+    reminders_created = 0
+    last_id = None
+
+    while True:
+        with transaction.atomic():
+            page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+            invoice_ids = list(page.values_list("id", flat=True)[:batch_size])
+            if not invoice_ids:
+                break
+
+            reminders = PaymentReminder.objects.bulk_create(
+                [
+                    PaymentReminder(
+                        invoice_id=invoice_id, reminder_type="payment_overdue"
+                    )
+                    for invoice_id in invoice_ids
+                ]
+            )
+
+        dispatch([reminder.id for reminder in reminders])
+        reminders_created += len(reminders)
+        last_id = invoice_ids[-1]
+
+    elapsed = time.monotonic() - started
+    logger.info("Created %d payment reminders in %.2fs", reminders_created, elapsed)
+    return reminders_created
+
+
+def deliver_reminders(reminder_ids):
+    """
+    Send the emails of a batch of reminders and flag the delivered ones with a
+    single update
+    """
+    reminders = PaymentReminder.objects.filter(
+        id__in=reminder_ids, email_sent=False
+    ).select_related("invoice__user", "invoice__plan")
+
+    sent_ids = send_batched(
+        [
+            (reminder.id, build_payment_reminder_email(reminder.invoice))
+            for reminder in reminders
+        ]
+    )
+
+    PaymentReminder.objects.filter(id__in=sent_ids).update(email_sent=True)
+    logger.info("Sent %d of %d payment reminders", len(sent_ids), len(reminder_ids))
+    return len(sent_ids)
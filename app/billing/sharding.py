@@ -0,0 +1,28 @@
+import uuid
+from django.db.models import Q
+
+
+UUID_SPACE = 1 << 128
+
+
+def shard_bounds(index, count):
+    """
+    Return the [lower, upper) UUID range covered by shard `index` of `count`.
+    The last shard is open ended so the whole UUID space is covered.
+    """
+    lower = uuid.UUID(int=index * UUID_SPACE // count)
+    upper = None
+    if index + 1 < count:
+        upper = uuid.UUID(int=(index + 1) * UUID_SPACE // count)
+    return lower, upper
+
+
+def shard_filter(index, count, field="id"):
+    """
+    Q filter restricting a UUID primary key (or FK) to a single shard
+    """
+    lower, upper = shard_bounds(index, count)
+    condition = Q(**{f"{field}__gte": lower})
+    if upper is not None:
+        condition &= Q(**{f"{field}__lt": upper})
+    return condition
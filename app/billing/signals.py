@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from app.billing.models import Plan, Subscription, Invoice
+from app.billing.dashboard import invalidate_dashboards
+from app.billing.catalog import plan_catalog
+from app.billing.entitlements import (
+    invalidate_entitlements,
+    invalidate_plan_entitlements,
+)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_user_dashboard(sender, instance, **kwargs):
+    """
+    Drop the cached dashboard once a change to one of the user's invoices or
+    subscriptions is committed, so a concurrent read cannot cache the old state
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_dashboards([user_id]))
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_catalog(sender, instance, **kwargs):
+    """
+    Bump the plan catalog version once a plan change is committed. Bumping it
+    earlier lets a concurrent request cache the old plans under the new version.
+    """
+    transaction.on_commit(plan_catalog.invalidate)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_user_entitlement(sender, instance, **kwargs):
+    """
+    Drop the cached entitlement of the user once a change to one of their
+    subscriptions (including cancel()) is committed
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_entitlements([user_id]))
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_subscriber_entitlements(sender, instance, **kwargs):
+    """
+    Drop the cached entitlements of a plan's subscribers when the plan changes
+    """
+    plan_id = instance.id
+    transaction.on_commit(lambda: invalidate_plan_entitlements(plan_id))
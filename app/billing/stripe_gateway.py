@@ -0,0 +1,400 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+import weakref
+import httpx
+from django.conf import settings
+from app.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# Stripe answers these when it is degraded or rate limiting; they are retried
+# and count against the circuit breaker. Other 4xx (declines, bad requests)
+# mean Stripe is healthy and are returned to the caller as they are.
+RETRIABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StripeGatewayError(Exception):
+    """
+    Error response from the Stripe API, or a failure to reach it
+    """
+
+    def __init__(self, message, status_code=None, retriable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retriable = retriable
+
+
+class CircuitOpenError(StripeGatewayError):
+    """
+    Raised without calling Stripe while the circuit breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    until `reset_timeout` seconds have passed. A single probe call is then let
+    through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.probe_started is not None or self.elapsed(self.opened_at):
+                return "half_open"
+            return "open"
+
+    def elapsed(self, since):
+        return time.monotonic() - since >= self.reset_timeout
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            # A probe that never reported back does not block the next one
+            if self.elapsed(self.opened_at) and (
+                self.probe_started is None or self.elapsed(self.probe_started)
+            ):
+                self.probe_started = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("Stripe circuit breaker closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probe_started = None
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        "Stripe circuit breaker opened after %d failures", self.failures
+                    )
+                self.opened_at = time.monotonic()
+
+
+class LatencyHistograms:
+    """
+    Process-local latency histogram and outcome counts per Stripe operation
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, operation, seconds, outcome):
+        with self.lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = self.histograms[operation] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "outcomes": {},
+                }
+            index = next(
+                (i for i, bound in enumerate(self.buckets) if seconds <= bound),
+                len(self.buckets),
+            )
+            histogram["counts"][index] += 1
+            histogram["sum"] += seconds
+            histogram["outcomes"][outcome] = histogram["outcomes"].get(outcome, 0) + 1
+
+    def snapshot(self):
+        """
+        Cumulative bucket counts keyed by upper bound, Prometheus style
+        """
+        with self.lock:
+            snapshot = {}
+            for operation, histogram in self.histograms.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(
+                    (*self.buckets, float("inf")), histogram["counts"]
+                ):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                snapshot[operation] = {
+                    "buckets": buckets,
+                    "count": cumulative,
+                    "sum": histogram["sum"],
+                    "outcomes": dict(histogram["outcomes"]),
+                }
+            return snapshot
+
+
+breaker = CircuitBreaker(
+    settings.STRIPE_BREAKER_THRESHOLD, settings.STRIPE_BREAKER_RESET_TIMEOUT
+)
+latency_histograms = LatencyHistograms(LATENCY_BUCKETS)
+
+sync_client = None
+sync_client_lock = threading.Lock()
+# One client per event loop: httpx async connections cannot be shared
+# between loops
+async_clients = weakref.WeakKeyDictionary()
+
+
+def client_options():
+    return {
+        "base_url": settings.STRIPE_API_BASE,
+        "auth": (settings.STRIPE_SECRET_KEY or "", ""),
+        "timeout": httpx.Timeout(
+            settings.STRIPE_TIMEOUT, connect=settings.STRIPE_CONNECT_TIMEOUT
+        ),
+        "limits": httpx.Limits(
+            max_connections=settings.STRIPE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.STRIPE_MAX_CONNECTIONS,
+        ),
+    }
+
+
+def get_client():
+    """
+    Keep-alive HTTP client shared by all threads of the process
+    """
+    global sync_client
+    if sync_client is None:
+        with sync_client_lock:
+            if sync_client is None:
+                sync_client = httpx.Client(**client_options())
+    return sync_client
+
+
+def get_async_client():
+    """
+    Keep-alive HTTP client bound to the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = async_clients.get(loop)
+    if client is None:
+        client = async_clients[loop] = httpx.AsyncClient(**client_options())
+    return client
+
+
+def reset_clients():
+    """
+    Drop the pooled clients so the next call picks up changed settings
+    """
+    global sync_client
+    with sync_client_lock:
+        if sync_client is not None:
+            sync_client.close()
+        sync_client = None
+    async_clients.clear()
+
+
+def encode_params(params, prefix=None):
+    """
+    Flatten nested dicts into Stripe's form encoding (metadata[key]=value)
+    """
+    encoded = {}
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if isinstance(value, dict):
+            encoded.update(encode_params(value, name))
+        else:
+            encoded[name] = value
+    return encoded
+
+
+def request_options(params, idempotency_key, timeout):
+    options = {
+        "data": encode_params(params),
+        "headers": {"Idempotency-Key": idempotency_key},
+    }
+    if timeout is not None:
+        options["timeout"] = httpx.Timeout(
+            timeout, connect=min(timeout, settings.STRIPE_CONNECT_TIMEOUT)
+        )
+    return options
+
+
+def check_circuit(operation):
+    if not breaker.allow():
+        latency_histograms.observe(operation, 0.0, "circuit_open")
+        raise CircuitOpenError("Stripe is unavailable, circuit breaker is open")
+
+
+def parse_response(response):
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    if response.is_error:
+        error = payload.get("error", {})
+        raise StripeGatewayError(
+            error.get("message", f"HTTP {response.status_code}"),
+            status_code=response.status_code,
+            retriable=response.status_code in RETRIABLE_STATUSES,
+        )
+    return payload
+
+
+def record_outcome(operation, started, error=None):
+    """
+    Record latency and feed the circuit breaker, returning the error as a
+    StripeGatewayError
+    """
+    elapsed = time.perf_counter() - started
+    if error is None:
+        latency_histograms.observe(operation, elapsed, "ok")
+        breaker.record_success()
+        return None
+
+    if isinstance(error, httpx.TimeoutException):
+        outcome = "timeout"
+        error = StripeGatewayError(f"Stripe timed out: {error!r}", retriable=True)
+    elif isinstance(error, httpx.HTTPError):
+        outcome = "unreachable"
+        error = StripeGatewayError(f"Could not reach Stripe: {error!r}", retriable=True)
+    else:
+        outcome = "error" if error.retriable else "rejected"
+
+    latency_histograms.observe(operation, elapsed, outcome)
+    if error.retriable:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return error
+
+
+def backoff_delay(attempt):
+    delay = min(settings.STRIPE_RETRY_BACKOFF * 2**attempt, settings.STRIPE_TIMEOUT)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def post(operation, path, params, timeout=None, idempotency_key=None):
+    """
+    POST to the Stripe API, retrying transient failures with the same
+    idempotency key
+    """
+    idempotency_key = idempotency_key or str(uuid.uuid4())
+    attempt = 0
+    while True:
+        check_circuit(operation)
+        started = time.perf_counter()
+        try:
+            response = get_client().post(
+                path, **request_options(params, idempotency_key, timeout)
+            )
+            payload = parse_response(response)
+        except (httpx.HTTPError, StripeGatewayError) as e:
+            error = record_outcome(operation, started, e)
+            if not error.retriable or attempt >= settings.STRIPE_MAX_RETRIES:
+                raise error from e
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+        else:
+            record_outcome(operation, started)
+            return payload
+
+
+async def apost(operation, path, params, timeout=None, idempotency_key=None):
+    """
+    Async version of post
+    """
+    idempotency_key = idempotency_key or str(uuid.uuid4())
+    attempt = 0
+    while True:
+        check_circuit(operation)
+        started = time.perf_counter()
+        try:
+            response = await get_async_client().post(
+                path, **request_options(params, idempotency_key, timeout)
+            )
+            payload = parse_response(response)
+        except (httpx.HTTPError, StripeGatewayError) as e:
+            error = record_outcome(operation, started, e)
+            if not error.retriable or attempt >= settings.STRIPE_MAX_RETRIES:
+                raise error from e
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+        else:
+            record_outcome(operation, started)
+            return payload
+
+
+def customer_params(email, name, metadata):
+    params = {"email": email, "name": name}
+    if metadata:
+        params["metadata"] = metadata
+    return params
+
+
+def payment_intent_params(amount, currency, customer, metadata):
+    return {
+        "amount": amount,
+        "currency": currency,
+        "customer": customer,
+        "metadata": metadata,
+    }
+
+
+def create_customer(email, name, metadata=None, timeout=None, idempotency_key=None):
+    return post(
+        "create_customer",
+        "/v1/customers",
+        customer_params(email, name, metadata),
+        timeout,
+        idempotency_key,
+    )
+
+
+def create_payment_intent(amount, currency, customer, metadata, timeout=None):
+    return post(
+        "create_payment_intent",
+        "/v1/payment_intents",
+        payment_intent_params(amount, currency, customer, metadata),
+        timeout,
+    )
+
+
+async def acreate_customer(
+    email, name, metadata=None, timeout=None, idempotency_key=None
+):
+    return await apost(
+        "create_customer",
+        "/v1/customers",
+        customer_params(email, name, metadata),
+        timeout,
+        idempotency_key,
+    )
+
+
+async def acreate_payment_intent(amount, currency, customer, metadata, timeout=None):
+    return await apost(
+        "create_payment_intent",
+        "/v1/payment_intents",
+        payment_intent_params(amount, currency, customer, metadata),
+        timeout,
+    )
+
+
+def gateway_stats():
+    """
+    Circuit breaker state and latency histograms of this process, for the
+    metrics endpoint
+    """
+    return {"circuit": breaker.state, "latency": latency_histograms.snapshot()}
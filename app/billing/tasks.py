@@ -1,8 +1,42 @@
-from datetime import timedelta
+from datetime import date, datetime
+from celery import chord
+from django.conf import settings
 from django.utils import timezone
-from app.logger import logger
+from app.logger import get_logger
 from app.celery.celery import saas_project_celery_app
-from app.billing.models import Subscription, Invoice, PaymentReminder
+from app.billing.models import Invoice
+from app.billing.invoicing import generate_due_invoices
+from app.billing.reminders import create_due_reminders, deliver_reminders
+from app.billing.webhooks import apply_events, drain_inbox
+from app.billing.dedup import purge_expired_events
+from app.billing.sharding import shard_filter
+from app.billing.dashboard import invalidate_dashboards
+from app.billing.customers import provision_customers
+
+
+logger = get_logger(__name__)
+
+
+def dispatch_shards(shard_task, label, *args):
+    """
+    Fan a billing run out as a chord of shard tasks with an aggregating callback
+    """
+    shard_count = settings.BILLING_SHARD_COUNT
+    chord(shard_task.s(index, shard_count, *args) for index in range(shard_count))(
+        aggregate_shard_results.s(label)
+    )
+    logger.info("Dispatched %d shards for %s", shard_count, label)
+    return f"Dispatched {shard_count} shards for {label}"
+
+
+@saas_project_celery_app.task(queue="sheduled_tasks")
+def aggregate_shard_results(results, label):
+    """
+    Sum the per-shard counts of a billing run
+    """
+    total = sum(results)
+    logger.info("%s: %d across %d shards", label, total, len(results))
+    return f"{label}: {total}"
 
 
 @saas_project_celery_app.task(
@@ -12,47 +46,32 @@ from app.billing.models import Subscription, Invoice, PaymentReminder
     bind=True,
     queue="sheduled_tasks",
 )
-def generate_invoices_for_active_subscriptions():
+def generate_invoices_for_active_subscriptions(self, *args):
     """
     Generate invoices for subscriptions that are due for billing today
     """
-    today = timezone.now().date()
-    subscriptions = Subscription.objects.filter(
-        status="active",
-        next_billing_date__date=today,
+    return dispatch_shards(
+        generate_invoices_shard,
+        "Generated invoices",
+        timezone.now().date().isoformat(),
     )
 
-    invoices_created = 0
-
-    for subscription in subscriptions:
-        existing_invoice = Invoice.objects.filter(
-            subscription=subscription,
-            issue_date__date=today,
-        ).first()
-
-        if not existing_invoice:
-            invoice = Invoice.objects.create(
-                user=subscription.user,
-                subscription=subscription,
-                plan=subscription.plan,
-                amount=subscription.plan.price,
-                issue_date=timezone.now(),
-                due_date=timezone.now() + timedelta(days=30),
-            )
-
-            if subscription.plan.billing_cycle == "monthly":
-                subscription.next_billing_date += timedelta(days=30)
-            else:
-                subscription.next_billing_date += timedelta(days=365)
-            subscription.save()
-
-            invoices_created += 1
-            logger.info(
-                f"Created invoice {invoice.id} for subscription {subscription.id}"
-            )
 
-    logger.info(f"Generated {invoices_created} invoices for active subscriptions")
-    return f"Generated {invoices_created} invoices"
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def generate_invoices_shard(index, shard_count, day):
+    """
+    Generate invoices for the due subscriptions of a single shard
+    """
+    result = generate_due_invoices(
+        date.fromisoformat(day), shard=shard_filter(index, shard_count)
+    )
+    return result["invoices_created"]
 
 
 @saas_project_celery_app.task(
@@ -62,16 +81,37 @@ def generate_invoices_for_active_subscriptions():
     bind=True,
     queue="sheduled_tasks",
 )
-def mark_overdue_invoices():
+def mark_overdue_invoices(self, *args):
     """
     Mark invoices as overdue if they are past their due date
     """
-    now = timezone.now()
-    overdue_invoices = Invoice.objects.filter(status="pending", due_date__lt=now)
+    return dispatch_shards(
+        mark_overdue_invoices_shard,
+        "Marked invoices as overdue",
+        timezone.now().isoformat(),
+    )
+
 
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def mark_overdue_invoices_shard(index, shard_count, now):
+    """
+    Mark the overdue invoices of a single shard
+    """
+    overdue_invoices = Invoice.objects.filter(
+        shard_filter(index, shard_count),
+        status="pending",
+        due_date__lt=datetime.fromisoformat(now),
+    )
+    user_ids = list(overdue_invoices.values_list("user_id", flat=True).distinct())
     updated_count = overdue_invoices.update(status="overdue")
-    logger.info(f"Marked {updated_count} invoices as overdue")
-    return f"Marked {updated_count} invoices as overdue"
+    invalidate_dashboards(user_ids)
+    return updated_count
 
 
 @saas_project_celery_app.task(
@@ -81,123 +121,115 @@ def mark_overdue_invoices():
     bind=True,
     queue="sheduled_tasks",
 )
-def send_payment_reminders():
+def send_payment_reminders(self, *args):
     """
     Send payment reminders for overdue invoices
     """
-    overdue_invoices = Invoice.objects.filter(status="overdue").select_related(
-        "user", "plan"
+    return dispatch_shards(send_payment_reminders_shard, "Sent payment reminders")
+
+
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def send_payment_reminders_shard(index, shard_count):
+    """
+    Create payment reminders for the overdue invoices of a single shard and
+    hand them to the delivery stage in batches
+    """
+    return create_due_reminders(
+        timezone.now().date(),
+        shard=shard_filter(index, shard_count),
+        dispatch=deliver_payment_reminders.delay,
     )
 
-    reminders_sent = 0
-
-    for invoice in overdue_invoices:
-        today = timezone.now().date()
-        reminder_exists = PaymentReminder.objects.filter(
-            invoice=invoice, sent_date__date=today
-        ).exists()
-
-        if not reminder_exists:
-            reminder = PaymentReminder.objects.create(
-                invoice=invoice, reminder_type="payment_overdue"
-            )
-
-            try:
-                send_payment_reminder_email(invoice)
-                reminder.email_sent = True
-                reminder.save()
-                reminders_sent += 1
-                logger.info(f"Sent payment reminder for invoice {invoice.id}")
-            except Exception as e:
-                logger.error(
-                    f"Failed to send reminder for invoice {invoice.id}: {str(e)}"
-                )
-
-    logger.info(f"Sent {reminders_sent} payment reminders")
-    return f"Sent {reminders_sent} payment reminders"
-
-
-def send_payment_reminder_email(invoice):
-    """
-    Send payment reminder email (mock implementation)
-    """
-    subject = f"Payment Reminder - Invoice {invoice.id}"
-    message = f"""
-    Dear {invoice.user.email},
-    
-    This is a reminder that your payment for {invoice.plan.name} plan is overdue.
-    
-    Invoice Details:
-    - Amount: ${invoice.amount}
-    - Due Date: {invoice.due_date.strftime('%Y-%m-%d')}
-    - Plan: {invoice.plan.name}
-    
-    Please make your payment as soon as possible to avoid service interruption.
-    
-    Thank you,
-    Billing Team
-    """
-
-    # Mock email sending (print to console in development)
-    print(f"SENDING EMAIL TO: {invoice.user.email}")
-    print(f"SUBJECT: {subject}")
-    print(f"MESSAGE: {message}")
-    print("-" * 50)
-
-
-@saas_project_celery_app.task
+
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def deliver_payment_reminders(reminder_ids):
+    """
+    Send the emails of a batch of payment reminders
+    """
+    return deliver_reminders(reminder_ids)
+
+
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+)
 def process_stripe_webhook(event_data):
     """
     Process Stripe webhook events
     """
-    event_type = event_data.get("type")
+    apply_events([event_data])
+    logger.info("Processed Stripe webhook: %s", event_data.get("type"))
 
-    if event_type == "invoice.payment_succeeded":
-        handle_successful_payment(event_data["data"]["object"])
-    elif event_type == "invoice.payment_failed":
-        handle_failed_payment(event_data["data"]["object"])
-    elif event_type == "customer.subscription.deleted":
-        handle_subscription_cancelled(event_data["data"]["object"])
 
-    logger.info(f"Processed Stripe webhook: {event_type}")
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def drain_stripe_webhook_inbox(*args):
+    """
+    Apply the Stripe webhook events waiting in the inbox in batches
+    """
+    processed = drain_inbox()
+    return f"Processed {processed} Stripe webhook events"
 
 
-def handle_successful_payment(stripe_invoice):
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_on=Exception,
+    max_retries=3,
+    bind=True,
+    queue="sheduled_tasks",
+)
+def purge_expired_stripe_events(self, *args):
     """
-    Handle successful payment from Stripe
+    Purge processed-event records and inbox rows past the dedup TTL
     """
-    try:
-        invoice = Invoice.objects.get(stripe_invoice_id=stripe_invoice["id"])
-        invoice.mark_paid()
-        logger.info(f"Marked invoice {invoice.id} as paid")
-    except Invoice.DoesNotExist:
-        logger.error(f"Invoice not found for Stripe invoice {stripe_invoice['id']}")
+    purged = purge_expired_events()
+    return f"Purged {purged} expired Stripe event records"
 
 
-def handle_failed_payment(stripe_invoice):
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def provision_stripe_customers(user_ids):
     """
-    Handle failed payment from Stripe
+    Create the Stripe customers of the given users ahead of their first payment
     """
-    try:
-        invoice = Invoice.objects.get(stripe_invoice_id=stripe_invoice["id"])
-        invoice.status = "failed"
-        invoice.save()
-        logger.info(f"Marked invoice {invoice.id} as failed")
-    except Invoice.DoesNotExist:
-        logger.error(f"Invoice not found for Stripe invoice {stripe_invoice['id']}")
+    provisioned = provision_customers(user_ids)
+    return f"Provisioned {provisioned} Stripe customers"
 
 
-def handle_subscription_cancelled(stripe_subscription):
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def provision_missing_stripe_customers(*args):
     """
-    Handle subscription cancellation from Stripe
+    Create the Stripe customers of every user still without one, in bulk
     """
-    try:
-        subscription = Subscription.objects.get(
-            stripe_subscription_id=stripe_subscription["id"]
-        )
-        subscription.cancel()
-        logger.info(f"Cancelled subscription {subscription.id}")
-    except Subscription.DoesNotExist:
-        logger.error(
-            f"Subscription not found for Stripe subscription {stripe_subscription['id']}"
-        )
+    provisioned = provision_customers()
+    return f"Provisioned {provisioned} Stripe customers"
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.utils import timezone
+from app.models import Invoice, Plan, Subscription, User
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(
+        username=username,
+        email=f"{username}@example.com",
+        password="test-password",
+        **extra,
+    )
+
+
+def create_plan(plan_type="basic", price=10):
+    return Plan.objects.create(name=plan_type.title(), plan_type=plan_type, price=price)
+
+
+def create_subscription(user, plan, status="active", **extra):
+    return Subscription.objects.create(user=user, plan=plan, status=status, **extra)
+
+
+def create_invoices(subscription, count, status="pending", **extra):
+    """
+    Bulk create `count` invoices of a subscription, due a day apart from a
+    week ago
+    """
+    due = timezone.now() - timedelta(days=7)
+    return Invoice.objects.bulk_create(
+        Invoice(
+            user_id=subscription.user_id,
+            subscription=subscription,
+            plan_id=subscription.plan_id,
+            amount=10,
+            due_date=due + timedelta(days=i),
+            status=status,
+            **extra,
+        )
+        for i in range(count)
+    )
+
+
+def stripe_event(event_id, event_type, object_id):
+    return {"id": event_id, "type": event_type, "data": {"object": {"id": object_id}}}
@@ -0,0 +1,71 @@
+from unittest import mock
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import path, reverse
+from app.billing import async_views
+from app.billing.tests.fixtures import (
+    create_invoices,
+    create_plan,
+    create_subscription,
+    create_user,
+)
+from app.users.authentication import forget_token_users, issue_token
+
+
+# The billing URLs with ASYNC_VIEWS on
+urlpatterns = [
+    path(
+        "invoices/<uuid:invoice_id>/stripe-payment/",
+        async_views.create_stripe_payment_intent,
+        name="stripe-payment",
+    ),
+]
+
+CSRF_SECRET = "a" * 32
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncPostTests(TestCase):
+    """
+    Async POST views take bearer tokens without a CSRF token, and check it
+    for session users like the DRF views do
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("async-views", stripe_customer_id="cus_async")
+        subscription = create_subscription(cls.user, create_plan())
+        (cls.invoice,) = create_invoices(subscription, 1)
+
+    def setUp(self):
+        # Users of other tests may be cached under the same id
+        forget_token_users([self.user.id])
+        self.client = AsyncClient(enforce_csrf_checks=True)
+        intent = {"id": "pi_async", "client_secret": "secret"}
+        patcher = mock.patch(
+            "app.billing.stripe_gateway.acreate_payment_intent",
+            new=mock.AsyncMock(return_value=intent),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pay(self, **headers):
+        return self.client.post(
+            reverse("stripe-payment", args=[self.invoice.id]), headers=headers
+        )
+
+    async def test_token_post_needs_no_csrf_token(self):
+        response = await self.pay(Authorization=f"Bearer {issue_token(self.user)}")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["payment_intent_id"], "pi_async")
+
+    async def test_session_post_without_csrf_token_is_refused(self):
+        await self.client.aforce_login(self.user)
+        response = await self.pay()
+        self.assertEqual(response.status_code, 403)
+        self.assertIn("CSRF Failed", response.json()["detail"])
+
+    async def test_session_post_with_csrf_token(self):
+        await self.client.aforce_login(self.user)
+        self.client.cookies["csrftoken"] = CSRF_SECRET
+        response = await self.pay(**{"X-CSRFToken": CSRF_SECRET})
+        self.assertEqual(response.status_code, 200, response.content)
@@ -0,0 +1,179 @@
+import re
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from app.billing import tasks
+from app.billing.pagination import KeysetPagination
+from app.billing.tests.fixtures import (
+    create_invoices,
+    create_plan,
+    create_subscription,
+    create_user,
+    stripe_event,
+)
+from app.models import (
+    Invoice,
+    PaymentReminder,
+    ProcessedStripeEvent,
+    StripeWebhookEvent,
+    Subscription,
+)
+
+
+# The plan catalog is a handful of cached rows, so it is left out
+BILLING_TABLES = {
+    model._meta.db_table
+    for model in (
+        Subscription,
+        Invoice,
+        PaymentReminder,
+        StripeWebhookEvent,
+        ProcessedStripeEvent,
+    )
+}
+SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN plans need PostgreSQL")
+class BillingIndexUsageTests(TestCase):
+    """
+    Every query of the billing tasks and views on the billing tables is
+    served by an index. Sequential scans are disabled so the planner picks an
+    index whenever one applies, even on these small tables.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        plan = create_plan()
+        cls.user = create_user("indexes", stripe_customer_id="cus_indexes")
+        cls.subscription = create_subscription(
+            cls.user,
+            plan,
+            stripe_subscription_id="sub_indexes",
+            next_billing_date=timezone.now(),
+        )
+        cls.invoice, *_ = create_invoices(
+            cls.subscription, 3, stripe_invoice_id="in_indexes"
+        )
+        create_invoices(cls.subscription, 2, status="overdue")
+        StripeWebhookEvent.objects.create(
+            event_id="evt_inbox",
+            event_type="invoice.payment_failed",
+            payload=stripe_event("evt_inbox", "invoice.payment_failed", "in_1"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def assertIndexScans(self, run):
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            plan = self.explain(sql)
+            with self.subTest(sql=sql):
+                scanned = set(SEQ_SCAN.findall(plan)) & BILLING_TABLES
+                self.assertFalse(scanned, plan)
+
+    def test_invoice_tasks(self):
+        today = timezone.now().date()
+        self.assertIndexScans(
+            lambda: tasks.generate_invoices_shard(0, 2, today.isoformat())
+        )
+        self.assertIndexScans(
+            lambda: tasks.mark_overdue_invoices_shard(0, 2, timezone.now().isoformat())
+        )
+
+    def test_reminder_tasks(self):
+        with mock.patch.object(
+            tasks.deliver_payment_reminders, "delay", tasks.deliver_payment_reminders
+        ):
+            self.assertIndexScans(lambda: tasks.send_payment_reminders_shard(0, 2))
+
+    def test_webhook_tasks(self):
+        self.assertIndexScans(
+            lambda: tasks.process_stripe_webhook(
+                stripe_event("evt_paid", "invoice.payment_succeeded", "in_indexes")
+            )
+        )
+        self.assertIndexScans(
+            lambda: tasks.process_stripe_webhook(
+                stripe_event(
+                    "evt_deleted", "customer.subscription.deleted", "sub_indexes"
+                )
+            )
+        )
+        self.assertIndexScans(tasks.drain_stripe_webhook_inbox)
+        ProcessedStripeEvent.objects.update(
+            processed_at=timezone.now() - timedelta(days=30)
+        )
+        self.assertIndexScans(tasks.purge_expired_stripe_events)
+
+    def test_read_views(self):
+        for url in (
+            reverse("subscription-list"),
+            reverse("invoice-list"),
+            reverse("invoice-detail", args=[self.invoice.id]),
+            reverse("billing-dashboard"),
+            reverse("my-entitlements"),
+        ):
+            self.assertIndexScans(lambda: self.client.get(url))
+
+    def test_deep_page_seeks_in_the_index(self):
+        # The cursor bounds the index scan instead of filtering the rows
+        # before it, which would make deep pages as slow as OFFSET
+        with mock.patch.object(KeysetPagination, "page_size", 1):
+            url = reverse("invoice-list")
+            for _ in range(3):
+                url = self.client.get(url).json()["next"]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+        (page_query,) = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+            and " LIMIT " in query["sql"]
+            and Invoice._meta.db_table in query["sql"]
+        ]
+        self.assertRegex(self.explain(page_query), r"Index Cond: .*created_at")
+
+    def test_write_views(self):
+        intent = {"id": "pi_indexes", "client_secret": "secret"}
+        with mock.patch(
+            "app.billing.stripe_gateway.create_payment_intent", return_value=intent
+        ):
+            self.assertIndexScans(
+                lambda: self.client.post(
+                    reverse("stripe-payment", args=[self.invoice.id])
+                )
+            )
+        self.assertIndexScans(
+            lambda: self.client.post(reverse("pay-invoice", args=[self.invoice.id]))
+        )
+        self.assertIndexScans(
+            lambda: self.client.post(
+                reverse("unsubscribe", args=[self.subscription.id])
+            )
+        )
+        self.assertIndexScans(
+            lambda: self.client.post(
+                reverse("subscribe"),
+                {"plan": str(self.subscription.plan_id)},
+                content_type="application/json",
+            )
+        )
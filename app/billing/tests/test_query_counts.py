@@ -0,0 +1,69 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app.billing.dashboard import invalidate_dashboards
+from app.billing.pagination import KeysetPagination
+from app.billing.tests.fixtures import (
+    create_invoices,
+    create_plan,
+    create_subscription,
+    create_user,
+)
+
+
+SMALL_PAGE = 2
+LARGE_PAGE = 10
+
+
+class QueryCountTests(TestCase):
+    """
+    The billing list endpoints and the dashboard run the same number of
+    queries whatever the number of rows they render
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("queries")
+        plans = [create_plan(plan_type) for plan_type in ("basic", "pro")]
+        for i in range(LARGE_PAGE):
+            create_subscription(cls.user, plans[i % 2], status="cancelled")
+        subscription = create_subscription(cls.user, plans[0])
+        create_invoices(subscription, LARGE_PAGE + 1)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        # The session is loaded by a first request, like on a warm server
+        self.client.get(url)
+        invalidate_dashboards([self.user.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def assertConstantQueries(self, url, rows, settings_for_size):
+        counts = {}
+        for size in (SMALL_PAGE, LARGE_PAGE):
+            with settings_for_size(size):
+                response, counts[size] = self.count_queries(url)
+            self.assertEqual(len(rows(response.json())), size)
+        self.assertEqual(counts[SMALL_PAGE], counts[LARGE_PAGE], counts)
+
+    def test_list_endpoints(self):
+        for name in ("subscription-list", "invoice-list"):
+            with self.subTest(name):
+                self.assertConstantQueries(
+                    reverse(name),
+                    lambda data: data["results"],
+                    lambda size: mock.patch.object(KeysetPagination, "page_size", size),
+                )
+
+    def test_dashboard(self):
+        self.assertConstantQueries(
+            reverse("billing-dashboard"),
+            lambda data: data["pending_invoices"],
+            lambda size: override_settings(DASHBOARD_PENDING_INVOICES_LIMIT=size),
+        )
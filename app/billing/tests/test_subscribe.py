@@ -0,0 +1,25 @@
+from unittest import mock
+from kombu.exceptions import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+from app.billing.tasks import provision_stripe_customers
+from app.billing.tests.fixtures import create_plan, create_user
+from app.models import Subscription
+
+
+class SubscribeTests(TestCase):
+    def test_broker_outage_does_not_fail_subscription(self):
+        user = create_user("subscribe")
+        plan = create_plan()
+        self.client.force_login(user)
+        with mock.patch.object(
+            provision_stripe_customers, "delay", side_effect=OperationalError
+        ), self.assertLogs("django.test", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("subscribe"),
+                    {"plan": str(plan.id)},
+                    content_type="application/json",
+                )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Subscription.objects.filter(user=user).exists())
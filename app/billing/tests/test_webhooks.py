@@ -0,0 +1,89 @@
+from unittest import mock
+from django.test import TestCase
+from app.billing.tests.fixtures import (
+    create_invoices,
+    create_plan,
+    create_subscription,
+    create_user,
+    stripe_event,
+)
+from app.billing.webhooks import EVENT_HANDLERS, apply_events, drain_inbox
+from app.models import StripeWebhookEvent
+
+
+class ApplyEventsTests(TestCase):
+    """
+    Events about the same invoice are applied in arrival order, and a paid
+    invoice stays paid
+    """
+
+    def setUp(self):
+        subscription = create_subscription(create_user("webhooks"), create_plan())
+        (self.invoice,) = create_invoices(subscription, 1, stripe_invoice_id="in_A")
+
+    def assertInvoiceStatus(self, event_types, status):
+        apply_events(
+            [
+                stripe_event(f"evt_{i}", event_type, "in_A")
+                for i, event_type in enumerate(event_types)
+            ]
+        )
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, status)
+
+    def test_failed_then_succeeded(self):
+        self.assertInvoiceStatus(
+            ["invoice.payment_failed", "invoice.payment_succeeded"], "paid"
+        )
+
+    def test_succeeded_then_failed(self):
+        self.assertInvoiceStatus(
+            ["invoice.payment_succeeded", "invoice.payment_failed"], "paid"
+        )
+
+    def test_failed_after_paid_in_a_later_batch(self):
+        self.assertInvoiceStatus(["invoice.payment_succeeded"], "paid")
+        apply_events([stripe_event("evt_late", "invoice.payment_failed", "in_A")])
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, "paid")
+
+
+class DrainInboxTests(TestCase):
+    """
+    An event that fails is recorded and left in the inbox, and the rest of its
+    batch is still applied
+    """
+
+    def setUp(self):
+        subscription = create_subscription(create_user("inbox"), create_plan())
+        (self.invoice,) = create_invoices(subscription, 1, stripe_invoice_id="in_A")
+        for event_id, event_type, object_id in (
+            ("evt_paid", "invoice.payment_succeeded", "in_A"),
+            ("evt_bad", "customer.subscription.deleted", "sub_bad"),
+        ):
+            StripeWebhookEvent.objects.create(
+                event_id=event_id,
+                event_type=event_type,
+                payload=stripe_event(event_id, event_type, object_id),
+            )
+
+    def test_failing_event_does_not_hold_back_the_batch(self):
+        def fail(stripe_ids, now):
+            raise RuntimeError("boom")
+
+        with mock.patch.dict(EVENT_HANDLERS, {"customer.subscription.deleted": fail}):
+            self.assertEqual(drain_inbox(), 1)
+            self.assertEqual(drain_inbox(), 0)
+
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, "paid")
+        paid = StripeWebhookEvent.objects.get(event_id="evt_paid")
+        self.assertIsNotNone(paid.processed_at)
+        bad = StripeWebhookEvent.objects.get(event_id="evt_bad")
+        self.assertIsNone(bad.processed_at)
+        self.assertEqual(bad.attempts, 2)
+        self.assertEqual(bad.last_error, "RuntimeError: boom")
+
+        self.assertEqual(drain_inbox(), 1)
+        bad.refresh_from_db()
+        self.assertIsNotNone(bad.processed_at)
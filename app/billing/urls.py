@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.urls import path
-from app.billing import views
+from app.billing import async_views, views
+
+
+# Under ASGI the I/O-bound endpoints are served by their async versions
+io_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path("plans/", views.PlanListView.as_view(), name="plan-list"),
@@ -13,12 +18,20 @@ urlpatterns = [
         name="unsubscribe",
     ),
     path("invoices/", views.InvoiceListView.as_view(), name="invoice-list"),
-    path("invoices/<uuid:invoice_id>/", views.invoice_detail, name="invoice-detail"),
+    path("invoices/<uuid:invoice_id>/", io_views.invoice_detail, name="invoice-detail"),
     path("invoices/<uuid:invoice_id>/pay/", views.pay_invoice, name="pay-invoice"),
     path(
         "invoices/<uuid:invoice_id>/stripe-payment/",
-        views.create_stripe_payment_intent,
+        io_views.create_stripe_payment_intent,
         name="stripe-payment",
     ),
-    path("dashboard/", views.billing_dashboard, name="billing-dashboard"),
+    path("dashboard/", io_views.billing_dashboard, name="billing-dashboard"),
+    path("entitlements/", views.my_entitlements, name="my-entitlements"),
+    path("entitlements/stats/", views.entitlement_stats, name="entitlement-stats"),
+    path(
+        "entitlements/<int:user_id>/",
+        views.user_entitlements,
+        name="user-entitlements",
+    ),
+    path("webhooks/stripe/", views.stripe_webhook, name="stripe-webhook"),
 ]
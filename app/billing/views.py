@@ -1,11 +1,20 @@
 import stripe
-from django.conf import settings
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from app.billing import stripe_gateway
+from app.billing.customers import ensure_customer
 from app.billing.models import Plan, Subscription, Invoice
 from app.billing.serializers import (
     PlanSerializer,
@@ -13,10 +22,16 @@ from app.billing.serializers import (
     SubscriptionCreateSerializer,
     InvoiceSerializer,
 )
-
-
-# Initialize Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from app.billing.dashboard import (
+    OPEN_INVOICE_STATUSES,
+    get_dashboard,
+    invalidate_dashboards,
+)
+from app.billing.entitlements import entitlement_metrics, get_entitlement
+from app.billing.catalog import plan_catalog, is_not_modified, set_validators
+from app.billing.pagination import KeysetPagination
+from app.billing.webhooks import verify_and_record
+from app.billing.tasks import provision_stripe_customers
 
 
 class PlanListView(generics.ListAPIView):
@@ -26,8 +41,21 @@ class PlanListView(generics.ListAPIView):
 
     queryset = Plan.objects.filter(is_active=True)
     serializer_class = PlanSerializer
+    # Public: no session or user lookup, so a 304 never touches the database
+    authentication_classes = []
     permission_classes = []
 
+    def get(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().get(request, *args, **kwargs)
+
+        entry = plan_catalog.get(lambda: JSONRenderer().render(self.list(request).data))
+        if is_not_modified(request, entry):
+            return set_validators(HttpResponseNotModified(), entry)
+        return set_validators(
+            HttpResponse(entry["body"], content_type="application/json"), entry
+        )
+
 
 class SubscriptionListView(generics.ListAPIView):
     """
@@ -36,10 +64,11 @@ class SubscriptionListView(generics.ListAPIView):
 
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Subscription.objects.filter(user=self.request.user).select_related(
-            "plan"
+        return self.get_serializer_class().setup_eager_loading(
+            Subscription.objects.filter(user=self.request.user)
         )
 
 
@@ -53,28 +82,39 @@ def subscribe_to_plan(request):
     if serializer.is_valid():
         plan = serializer.validated_data["plan"]
 
-        existing_subscription = Subscription.objects.filter(
-            user=request.user, status="active"
-        ).first()
-
-        if existing_subscription:
+        # The one-active-subscription-per-user constraint is the check, so
+        # concurrent retries cannot both create a subscription
+        try:
+            with transaction.atomic():
+                subscription = Subscription.objects.create(
+                    user=request.user,
+                    plan=plan,
+                    status="active",
+                    start_date=timezone.now(),
+                )
+
+                first_invoice = Invoice.objects.create(
+                    user=request.user,
+                    subscription=subscription,
+                    plan=plan,
+                    amount=plan.price,
+                    issue_date=timezone.now(),
+                )
+
+                if not request.user.stripe_customer_id:
+                    # robust: a broker outage must not fail the committed
+                    # subscription; provision_missing_stripe_customers catches up
+                    user_id = request.user.id
+                    transaction.on_commit(
+                        lambda: provision_stripe_customers.delay([user_id]),
+                        robust=True,
+                    )
+        except IntegrityError:
             return Response(
                 {"error": "You already have an active subscription"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        subscription = Subscription.objects.create(
-            user=request.user, plan=plan, status="active", start_date=timezone.now()
-        )
-
-        first_invoice = Invoice.objects.create(
-            user=request.user,
-            subscription=subscription,
-            plan=plan,
-            amount=plan.price,
-            issue_date=timezone.now(),
-        )
-
         return Response(
             {
                 "message": "Successfully subscribed to plan",
@@ -120,10 +160,11 @@ class InvoiceListView(generics.ListAPIView):
 
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Invoice.objects.filter(user=self.request.user).select_related(
-            "plan", "subscription"
+        return self.get_serializer_class().setup_eager_loading(
+            Invoice.objects.filter(user=self.request.user)
         )
 
 
@@ -133,7 +174,11 @@ def invoice_detail(request, invoice_id):
     """
     Get invoice details
     """
-    invoice = get_object_or_404(Invoice, id=invoice_id, user=request.user)
+    invoice = get_object_or_404(
+        InvoiceSerializer.setup_eager_loading(Invoice.objects.all()),
+        id=invoice_id,
+        user=request.user,
+    )
     serializer = InvoiceSerializer(invoice)
     return Response(serializer.data)
 
@@ -144,22 +189,14 @@ def pay_invoice(request, invoice_id):
     """
     Pay an invoice (mock implementation)
     """
-    invoice = get_object_or_404(Invoice, id=invoice_id, user=request.user)
-
-    if invoice.status != "pending" and invoice.status != "overdue":
-        return Response(
-            {"error": "Invoice cannot be paid"}, status=status.HTTP_400_BAD_REQUEST
-        )
+    invoices = Invoice.objects.filter(id=invoice_id, user=request.user)
 
     try:
-        invoice.mark_paid()
-
-        return Response(
-            {
-                "message": "Payment processed successfully",
-                "invoice": InvoiceSerializer(invoice).data,
-            },
-            status=status.HTTP_200_OK,
+        # Only one of several concurrent payments can move the invoice out of
+        # an open status
+        now = timezone.now()
+        paid = invoices.filter(status__in=OPEN_INVOICE_STATUSES).update(
+            status="paid", paid_date=now, updated_at=now
         )
 
     except Exception as e:
@@ -168,6 +205,23 @@ def pay_invoice(request, invoice_id):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    if not paid:
+        get_object_or_404(invoices)
+        return Response(
+            {"error": "Invoice cannot be paid"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    invalidate_dashboards([request.user.id])
+    invoice = InvoiceSerializer.setup_eager_loading(invoices).get()
+
+    return Response(
+        {
+            "message": "Payment processed successfully",
+            "invoice": InvoiceSerializer(invoice).data,
+        },
+        status=status.HTTP_200_OK,
+    )
+
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -183,33 +237,38 @@ def create_stripe_payment_intent(request, invoice_id):
         )
 
     try:
-        if not request.user.stripe_customer_id:
-            customer = stripe.Customer.create(
-                email=request.user.email,
-                name=request.user.username,
-            )
-            request.user.stripe_customer_id = customer.id
-            request.user.save()
+        # Normally provisioned in the background at registration, leaving a
+        # single Stripe call on this path
+        customer_id = ensure_customer(request.user)
 
-        intent = stripe.PaymentIntent.create(
+        intent = stripe_gateway.create_payment_intent(
             amount=int(invoice.amount * 100),
             currency="usd",
-            customer=request.user.stripe_customer_id,
+            customer=customer_id,
             metadata={
                 "invoice_id": str(invoice.id),
                 "user_id": str(request.user.id),
             },
         )
 
-        invoice.payment_intent_id = intent.id
-        invoice.save()
+        invoice.payment_intent_id = intent["id"]
+        invoice.save(update_fields=["payment_intent_id", "updated_at"])
 
         return Response(
-            {"client_secret": intent.client_secret, "payment_intent_id": intent.id},
+            {
+                "client_secret": intent["client_secret"],
+                "payment_intent_id": intent["id"],
+            },
             status=status.HTTP_200_OK,
         )
 
-    except stripe.error.StripeError as e:
+    except stripe_gateway.CircuitOpenError:
+        return Response(
+            {"error": "Payments are temporarily unavailable, please retry later"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    except stripe_gateway.StripeGatewayError as e:
         return Response(
             {"error": f"Stripe error: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST
         )
@@ -221,38 +280,55 @@ def billing_dashboard(request):
     """
     Get user's billing dashboard data
     """
-    user = request.user
+    return Response(get_dashboard(request.user))
 
-    active_subscription = (
-        Subscription.objects.filter(user=user, status="active")
-        .select_related("plan")
-        .first()
-    )
 
-    recent_invoices = (
-        Invoice.objects.filter(user=user)
-        .select_related("plan")
-        .order_by("-created_at")[:5]
-    )
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_entitlements(request):
+    """
+    Get the active plan and features of the current user
+    """
+    return Response(get_entitlement(request.user.id))
 
-    pending_invoices = Invoice.objects.filter(
-        user=user, status__in=["pending", "overdue"]
-    ).select_related("plan")
 
-    total_owed = sum(invoice.amount for invoice in pending_invoices)
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def user_entitlements(request, user_id):
+    """
+    Get the active plan and features of any user, for product services
+    """
+    return Response(get_entitlement(user_id))
 
-    return Response(
-        {
-            "active_subscription": (
-                SubscriptionSerializer(active_subscription).data
-                if active_subscription
-                else None
-            ),
-            "recent_invoices": InvoiceSerializer(recent_invoices, many=True).data,
-            "pending_invoices": InvoiceSerializer(pending_invoices, many=True).data,
-            "total_owed": total_owed,
-            "next_billing_date": (
-                active_subscription.next_billing_date if active_subscription else None
-            ),
-        }
-    )
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def entitlement_stats(request):
+    """
+    Get the entitlement cache hit and miss counters of this process
+    """
+    return Response(entitlement_metrics.snapshot())
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def stripe_webhook(request):
+    """
+    Receive a Stripe webhook, verify its signature and queue it in the inbox
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        # Never verify against an empty key: anyone could sign with it
+        return Response(
+            {"error": "Webhooks are not configured"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    try:
+        verify_and_record(request.body, request.headers.get("Stripe-Signature", ""))
+    except (stripe.error.SignatureVerificationError, ValueError, KeyError):
+        return Response(
+            {"error": "Invalid webhook"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({"received": True}, status=status.HTTP_200_OK)
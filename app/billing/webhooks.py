@@ -0,0 +1,219 @@
+import json
+import stripe
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from app.logger import get_logger
+from app.billing.models import Subscription, Invoice, StripeWebhookEvent
+from app.billing.dashboard import invalidate_dashboards
+from app.billing.entitlements import invalidate_entitlements
+from app.billing.dedup import (
+    claim_events,
+    dedup_metrics,
+    is_recent_duplicate,
+    recent_events,
+)
+
+
+logger = get_logger(__name__)
+
+
+def verify_and_record(payload, signature):
+    """
+    Verify a Stripe webhook signature and store the raw event in the inbox,
+    unless it is a recently seen re-delivery.
+    Raises stripe.error.SignatureVerificationError or ValueError when the
+    request is not a valid Stripe event, and ImproperlyConfigured when
+    STRIPE_WEBHOOK_SECRET is not set.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise ImproperlyConfigured("STRIPE_WEBHOOK_SECRET is not set")
+    stripe.WebhookSignature.verify_header(
+        payload.decode("utf-8"),
+        signature,
+        settings.STRIPE_WEBHOOK_SECRET,
+        settings.STRIPE_WEBHOOK_TOLERANCE,
+    )
+    event = json.loads(payload)
+    if is_recent_duplicate(event["id"]):
+        return None
+
+    inbox_event = StripeWebhookEvent.objects.create(
+        event_id=event["id"],
+        event_type=event["type"],
+        payload=event,
+    )
+    recent_events.add(event["id"])
+    return inbox_event
+
+
+def handle_successful_payments(stripe_invoice_ids, now):
+    invoices = Invoice.objects.filter(stripe_invoice_id__in=stripe_invoice_ids)
+    return apply_update(
+        invoices.exclude(status="paid"),
+        invoices,
+        stripe_invoice_ids,
+        "stripe_invoice_id",
+        status="paid",
+        paid_date=now,
+        updated_at=now,
+    )
+
+
+def handle_failed_payments(stripe_invoice_ids, now):
+    invoices = Invoice.objects.filter(stripe_invoice_id__in=stripe_invoice_ids)
+    # A payment failing after the invoice was paid (e.g. an earlier retry of
+    # the charge, delivered late) does not undo the payment
+    return apply_update(
+        invoices.exclude(status="paid"),
+        invoices,
+        stripe_invoice_ids,
+        "stripe_invoice_id",
+        status="failed",
+        updated_at=now,
+    )
+
+
+def handle_subscriptions_cancelled(stripe_subscription_ids, now):
+    subscriptions = Subscription.objects.filter(
+        stripe_subscription_id__in=stripe_subscription_ids
+    )
+    return apply_update(
+        subscriptions,
+        subscriptions,
+        stripe_subscription_ids,
+        "stripe_subscription_id",
+        status="cancelled",
+        end_date=now,
+        updated_at=now,
+    )
+
+
+EVENT_HANDLERS = {
+    "invoice.payment_succeeded": handle_successful_payments,
+    "invoice.payment_failed": handle_failed_payments,
+    "customer.subscription.deleted": handle_subscriptions_cancelled,
+}
+
+
+def apply_update(targets, matches, stripe_ids, stripe_field, **values):
+    """
+    Apply one set-based UPDATE for a group of events and report the Stripe ids
+    that matched no local row
+    """
+    found = set(matches.values_list(stripe_field, flat=True))
+    missing = set(stripe_ids) - found
+    if missing:
+        logger.error(
+            "No local rows for %d Stripe ids: %s", len(missing), sorted(missing)
+        )
+
+    user_ids = list(targets.values_list("user_id", flat=True))
+    updated_count = targets.update(**values)
+    transaction.on_commit(lambda: invalidate_dashboards(user_ids))
+    if targets.model is Subscription:
+        transaction.on_commit(lambda: invalidate_entitlements(user_ids))
+    return updated_count
+
+
+def apply_events(events):
+    """
+    Apply raw Stripe events in arrival order, each run of consecutive events
+    of one type with one update, so a later event about an object is never
+    overwritten by an earlier one. Events already recorded in the
+    processed-event store are skipped. The claim and the updates commit
+    together, so an event whose handler fails is not left claimed but never
+    applied.
+    """
+    with transaction.atomic():
+        claimed = claim_events(event["id"] for event in events)
+        handled = []
+        for event in events:
+            if event["id"] not in claimed:
+                continue
+            claimed.discard(event["id"])
+            if event.get("type") in EVENT_HANDLERS:
+                handled.append(event)
+
+        now = timezone.now()
+        for event_type, run in groupby(handled, key=itemgetter("type")):
+            stripe_ids = [event["data"]["object"]["id"] for event in run]
+            updated_count = EVENT_HANDLERS[event_type](stripe_ids, now)
+            logger.info(
+                "Processed %d %s events, updated %d",
+                len(stripe_ids),
+                event_type,
+                updated_count,
+            )
+
+
+def apply_inbox_events(batch):
+    """
+    Apply a batch of inbox events and return the ones that failed. The batch
+    is applied at once in a savepoint; if that fails, each event is retried
+    in its own, so one bad event does not hold back the rest of the batch.
+    """
+    try:
+        apply_events([event.payload for event in batch])
+        return []
+    except Exception:
+        logger.warning("Stripe inbox batch of %d events failed", len(batch))
+
+    failed = []
+    for event in batch:
+        try:
+            apply_events([event.payload])
+        except Exception as e:
+            logger.exception("Stripe event %s failed", event.event_id)
+            event.attempts += 1
+            event.last_error = f"{type(e).__name__}: {e}"
+            failed.append(event)
+    return failed
+
+
+def drain_inbox(batch_size=None):
+    """
+    Process pending inbox events in batches until the inbox is empty.
+    Batches are claimed with SKIP LOCKED so several consumers can drain
+    concurrently. Failed events count their attempts and keep their last
+    error; they are retried on the next drains, up to WEBHOOK_MAX_ATTEMPTS.
+    """
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    processed = 0
+    last_id = 0
+
+    while True:
+        with transaction.atomic():
+            # Keyset over the inbox, so failed events are not picked up again
+            # by this drain
+            batch = list(
+                StripeWebhookEvent.objects.filter(
+                    processed_at__isnull=True,
+                    id__gt=last_id,
+                    attempts__lt=settings.WEBHOOK_MAX_ATTEMPTS,
+                )
+                .select_for_update(skip_locked=True)
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            failed = apply_inbox_events(batch)
+            failed_ids = {event.id for event in failed}
+            StripeWebhookEvent.objects.filter(
+                id__in=[event.id for event in batch if event.id not in failed_ids]
+            ).update(processed_at=timezone.now())
+            if failed:
+                StripeWebhookEvent.objects.bulk_update(
+                    failed, ["attempts", "last_error"]
+                )
+
+        processed += len(batch) - len(failed)
+
+    if processed:
+        logger.info("Stripe event dedup metrics: %s", dedup_metrics.snapshot())
+    return processed
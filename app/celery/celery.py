@@ -1,8 +1,10 @@
 import os
 from celery import Celery
-from app.logger import logger
+from app.logger import get_logger
 
 
+logger = get_logger(__name__)
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "saas_project.settings")
 
 BROKER_URL = "{schema}://{username}:{password}@{host}:{port}//".format(
@@ -28,6 +30,12 @@ BROKER_URL = "{schema}://{username}:{password}@{host}:{port}//".format(
     ),
 )
 
+# Result backend is required for the chords used by sharded billing runs
+RESULT_BACKEND_URL = os.getenv(
+    "CELERY_RESULT_BACKEND",
+    "redis://saas_cache:6379/1",
+)
+
 
 def create_celery_app() -> Celery:
     """Create and configure the Celery application"""
@@ -36,6 +44,7 @@ def create_celery_app() -> Celery:
     app = Celery(
         "saas_project_celery_app",
         broker=BROKER_URL,
+        backend=RESULT_BACKEND_URL,
     )
 
     # Configure broker connection retry
@@ -54,12 +63,14 @@ def create_celery_app() -> Celery:
     # Task settings
     app.conf.task_acks_late = True
     app.conf.task_reject_on_worker_lost = True
+    app.conf.result_expires = 60 * 60 * 24
 
     # Tasks
     app.autodiscover_tasks(
         [
             "app.celery.tasks",
             "app.billing.tasks",
+            "app.users.tasks",
         ]
     )
 
@@ -1,15 +1,19 @@
 from celery.schedules import crontab
+from django.conf import settings
 from app.celery.celery import saas_project_celery_app
 from app.billing.tasks import (
     mark_overdue_invoices,
     send_payment_reminders,
     generate_invoices_for_active_subscriptions,
+    drain_stripe_webhook_inbox,
+    purge_expired_stripe_events,
+    provision_missing_stripe_customers,
 )
+from app.users.tasks import purge_sessions
 
 
 @saas_project_celery_app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
-
     sender.add_periodic_task(
         crontab(hour=1, minute=0),
         mark_overdue_invoices.s("Runs every day at 1 AM and marks overdue invoices"),
@@ -26,3 +30,27 @@ def setup_periodic_tasks(sender, **kwargs):
             "Runs every day at 9 AM and generates invoices for active subscriptions"
         ),
     ),
+
+    sender.add_periodic_task(
+        settings.WEBHOOK_DRAIN_INTERVAL,
+        drain_stripe_webhook_inbox.s("Drains the Stripe webhook inbox"),
+    ),
+
+    sender.add_periodic_task(
+        crontab(hour=3, minute=0),
+        purge_expired_stripe_events.s(
+            "Runs every day at 3 AM and purges expired Stripe event records"
+        ),
+    ),
+
+    sender.add_periodic_task(
+        settings.STRIPE_PROVISION_INTERVAL,
+        provision_missing_stripe_customers.s(
+            "Provisions Stripe customers for users without one"
+        ),
+    ),
+
+    sender.add_periodic_task(
+        settings.SESSION_PURGE_INTERVAL,
+        purge_sessions.s("Purges expired sessions"),
+    ),
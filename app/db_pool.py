@@ -0,0 +1,22 @@
+from django.db import connections
+
+
+def get_pool_stats():
+    """
+    Connection pool statistics per database alias, including saturation
+    (share of the pool's maximum size currently checked out)
+    """
+    stats = {}
+    for alias in connections:
+        # Reading `.pool` opens the pool, so only report pools already in use.
+        # They are shared by the process, unlike the thread's connections.
+        pool = getattr(connections[alias], "_connection_pools", {}).get(alias)
+        if pool is None:
+            continue
+
+        pool_stats = pool.get_stats()
+        in_use = pool_stats.get("pool_size", 0) - pool_stats.get("pool_available", 0)
+        pool_stats["in_use"] = in_use
+        pool_stats["saturation"] = in_use / pool.max_size if pool.max_size else 0.0
+        stats[alias] = pool_stats
+    return stats
@@ -0,0 +1,164 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from app.users.authentication import token_user_id
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Routing state of the current request. None outside a request (Celery tasks,
+# management commands), in which case everything goes to the primary.
+routing_state = ContextVar("routing_state", default=None)
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def primary_pin_key(user_id):
+    return f"db:primary_pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Send the reads of a user to the primary for REPLICA_PIN_SECONDS, long
+    enough for the replicas to catch up with what they just wrote
+    """
+    cache.set(primary_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(primary_pin_key(user_id)) is not None
+
+
+def request_user_id(request):
+    """
+    Id of the logged-in user of a request, read from its bearer token or its
+    session without loading the user
+    """
+    user_id = token_user_id(request)
+    if user_id is not None:
+        return user_id
+    session = getattr(request, "session", None)
+    return session.get(SESSION_KEY) if session is not None else None
+
+
+async def arequest_user_id(request):
+    user_id = token_user_id(request)
+    if user_id is not None:
+        return user_id
+    session = getattr(request, "session", None)
+    return await session.aget(SESSION_KEY) if session is not None else None
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send the reads inside the block to the primary. For data cached right
+    after a write invalidated it, where a lagging replica would be cached as
+    fresh. Also usable as a decorator.
+    """
+    outer = routing_state.get()
+    state = RoutingState(use_replica=False)
+    token = routing_state.set(state)
+    try:
+        yield
+    finally:
+        routing_state.reset(token)
+        if state.wrote and outer is not None:
+            outer.wrote = True
+
+
+class ReplicaRouter:
+    """
+    Send reads of safe requests to a random replica and everything else to
+    the primary (default) database
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return "default"
+        if not settings.DATABASE_REPLICAS:
+            return "default"
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        # Other databases keep Django's rule: relations within one database
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe requests to the replicas unless the user wrote
+    recently, and pin users to the primary after a request that wrote
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        user_id = request_user_id(request)
+        use_replica = request.method in SAFE_METHODS and not (
+            user_id is not None and is_pinned_to_primary(user_id)
+        )
+        state = RoutingState(use_replica)
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if state.wrote:
+            self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        user_id = await arequest_user_id(request)
+        use_replica = request.method in SAFE_METHODS and not (
+            user_id is not None
+            and await cache.aget(primary_pin_key(user_id)) is not None
+        )
+        state = RoutingState(use_replica)
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        if state.wrote:
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def pin_writer(self, request):
+        # The user may only be known once the view logged them in
+        user_id = request_user_id(request)
+        if user_id is not None:
+            pin_to_primary(user_id)
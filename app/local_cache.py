@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalTTLCache:
+    """
+    Bounded in-process LRU whose entries expire after `ttl` seconds. It keeps
+    hot entries of this process one dict lookup away; the short TTL bounds
+    how long an invalidation made by another process goes unseen.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CacheCounters:
+    """
+    Process-local counters of cache lookups per level that served them. The
+    hit rate is the share of `hits` levels among hits and "misses"; any other
+    counter (e.g. rejections) is reported but left out of it.
+    """
+
+    def __init__(self, hits, others=("misses",)):
+        self.hits = hits
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys((*hits, *others), 0)
+
+    def record(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        hits = sum(counts[name] for name in self.hits)
+        lookups = hits + counts["misses"]
+        counts["hit_rate"] = hits / lookups if lookups else 0.0
+        return counts
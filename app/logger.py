@@ -1,29 +1,163 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
 
-def setup_custom_logger():
+# LOG_FORMAT is json (one object per line, for log shipping) or text.
+# LOG_LEVEL applies to every app logger and LOG_LEVELS overrides it per
+# module, e.g. "app.billing.invoicing=DEBUG,app.billing.mailer=WARNING".
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Records waiting for the writer thread; beyond it records are dropped
+# rather than blocking the caller
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 100000))
 
-    # log formate
-    formatter = logging.Formatter(
-        fmt=(
-            "%(levelname)s | %(asctime)s | Process: %(process)d | Thread: %(threadName)s | "
-            "Module: %(module)s | File: %(filename)s | Function: %(funcName)s | Line: %(lineno)d | "
-            "Message: %(message)s"
-        ),
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+TEXT_FORMAT = (
+    "%(levelname)s | %(asctime)s | Process: %(process)d | Thread: %(threadName)s | "
+    "Module: %(module)s | File: %(filename)s | Function: %(funcName)s | Line: %(lineno)d | "
+    "Message: %(message)s"
+)
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with the fields passed in `extra` included
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without waiting on I/O. Only the
+    message is rendered in the calling thread; the full format and the
+    write happen in the listener.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    Waits for room for the stop sentinel, so stopping with a full queue
+    flushes the pending records instead of failing
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
 
-    # handler
-    handler = logging.StreamHandler()
-    handler.setFormatter(formatter)
 
-    # logger setup  and logging level set to DEBUG it can adjust accordingly
-    logger = logging.getLogger("TRI Orchestrator Logger !!!")
-    logger.setLevel(logging.DEBUG)
+def build_formatter(log_format=LOG_FORMAT):
+    if log_format == "text":
+        return logging.Formatter(fmt=TEXT_FORMAT, datefmt="%Y-%m-%d %H:%M:%S")
+    return JsonFormatter()
+
+
+def start_queue_pipeline(target, queue_size=LOG_QUEUE_SIZE):
+    """
+    Queue handler for the callers, and the started listener thread writing
+    its records to the `target` handler
+    """
+    log_queue = queue.Queue(queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    listener = DrainingQueueListener(log_queue, target, respect_handler_level=True)
+    listener.start()
+    return handler, listener
+
+
+def restart_listener_in_child(handler, listener):
+    """
+    Threads do not survive fork: give forked workers (gunicorn, Celery
+    prefork) a fresh queue and their own writer thread
+    """
+    log_queue = queue.Queue(handler.queue.maxsize)
+    handler.queue = listener.queue = log_queue
+    listener.start()
+
+
+def parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_custom_logger():
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(build_formatter())
+    handler, listener = start_queue_pipeline(stream_handler)
+    os.register_at_fork(
+        after_in_child=lambda: restart_listener_in_child(handler, listener)
+    )
+    atexit.register(listener.stop)
+
+    # every module logs to a child of the "app" logger, which alone writes
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL.upper())
     logger.addHandler(handler)
+    logger.propagate = False
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
 
     return logger
 
 
+def get_logger(name):
+    """
+    Logger of a module, configurable with LOG_LEVELS. Pass `__name__`.
+    """
+    if name != "app" and not name.startswith("app."):
+        name = f"app.{name}"
+    return logging.getLogger(name)
+
+
 logger = setup_custom_logger()
 logger.info("Logger set up successfully")
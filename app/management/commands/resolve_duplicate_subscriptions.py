@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from app.logger import get_logger
+from app.billing.models import Subscription
+
+
+logger = get_logger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "List users with several active subscriptions, which block the "
+        "sub_one_active_per_user index. With --cancel, keep the newest one of "
+        "each user and cancel the others that have no Stripe subscription."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cancel",
+            action="store_true",
+            help="cancel the duplicates without a Stripe subscription",
+        )
+
+    def handle(self, *args, cancel=False, **options):
+        user_ids = (
+            Subscription.objects.filter(status="active")
+            .values("user_id")
+            .annotate(active=Count("id"))
+            .filter(active__gt=1)
+            .values_list("user_id", flat=True)
+        )
+        remaining = 0
+        for user_id in user_ids.iterator():
+            newest, *duplicates = Subscription.objects.filter(
+                user_id=user_id, status="active"
+            ).order_by("-created_at", "-id")
+            self.stdout.write(f"User {user_id}: keeping subscription {newest.id}")
+            for subscription in duplicates:
+                remaining += self.resolve(subscription, cancel)
+
+        self.stdout.write(f"{remaining} duplicate subscriptions left to resolve")
+
+    def resolve(self, subscription, cancel):
+        """
+        Cancel a duplicate, or report it. Returns 1 when it is left active.
+        """
+        if subscription.stripe_subscription_id:
+            # Cancelling it here would keep charging the customer in Stripe;
+            # its customer.subscription.deleted webhook cancels it locally
+            self.stdout.write(
+                f"  {subscription.id}: cancel Stripe subscription "
+                f"{subscription.stripe_subscription_id} first"
+            )
+            return 1
+        if not cancel:
+            self.stdout.write(f"  {subscription.id}: would be cancelled")
+            return 1
+
+        with transaction.atomic():
+            # cancel() saves, so the signals drop the cached entitlement and
+            # dashboard of the user on commit
+            subscription.cancel()
+        logger.warning(
+            "Cancelled duplicate active subscription %s of user %s (plan %s)",
+            subscription.id,
+            subscription.user_id,
+            subscription.plan_id,
+        )
+        self.stdout.write(f"  {subscription.id}: cancelled")
+        return 0
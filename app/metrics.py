@@ -0,0 +1,513 @@
+import math
+import os
+import random
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from app.logger import get_logger
+from app.db_pool import get_pool_stats
+from app.billing import stripe_gateway
+from app.billing.dedup import dedup_metrics
+from app.billing.entitlements import entitlement_metrics
+from app.users.authentication import token_metrics
+
+
+logger = get_logger(__name__)
+
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+PROCESS_INDEX_KEY = "metrics:processes"
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+METRIC_HELP = {
+    "http_request_duration_seconds": "Wall time of requests per URL name",
+    "http_requests_total": "Requests per URL name and status code",
+    "http_requests_sampled_total": "Requests sampled for DB and serialization time",
+    "http_request_db_queries_total": "DB queries of sampled requests",
+    "http_request_db_seconds_total": "DB time of sampled requests",
+    "http_request_serialization_seconds_total": "Serialization time of sampled requests",
+    "celery_task_duration_seconds": "Wall time of Celery tasks per task name",
+    "celery_tasks_total": "Celery task runs per task name and state",
+    "celery_tasks_sampled_total": "Task runs sampled for DB and serialization time",
+    "celery_task_db_queries_total": "DB queries of sampled task runs",
+    "celery_task_db_seconds_total": "DB time of sampled task runs",
+    "celery_task_serialization_seconds_total": "Serialization time of sampled task runs",
+    "stripe_request_duration_seconds": "Latency of Stripe API calls per operation",
+    "stripe_requests_total": "Stripe API calls per operation and outcome",
+    "stripe_circuit_state": "Stripe circuit breaker state (0 closed, 1 half open, 2 open)",
+    "entitlement_cache_lookups_total": "Entitlement lookups per cache level served",
+    "stripe_event_dedup_total": "Stripe event ids per dedup level that caught them",
+    "auth_token_lookups_total": "Token authentications per user cache result",
+    "db_pool_size": "Open connections of the database pool",
+    "db_pool_connections_in_use": "Database pool connections checked out",
+    "db_pool_requests_waiting": "Requests waiting for a database pool connection",
+}
+
+
+class Sample:
+    """
+    DB and serialization time of one sampled request or task run
+    """
+
+    __slots__ = ("queries", "db_seconds", "serialization_seconds", "serializing")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.serializing = False
+
+
+# Sample of the current request or task, None when it is not sampled
+current_sample = ContextVar("metrics_sample", default=None)
+
+
+def start_sample():
+    """
+    Start measuring the current request or task if it falls in the sample
+    """
+    if random.random() >= settings.METRICS_SAMPLE_RATE:
+        return None, None
+    sample = Sample()
+    return sample, current_sample.set(sample)
+
+
+def record_query(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db_seconds += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Add the time spent in the block to the sampled serialization time.
+    Nested blocks (a renderer around serializer data) are counted once.
+    """
+    sample = current_sample.get()
+    if sample is None or sample.serializing:
+        yield
+        return
+    sample.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serialization_seconds += time.perf_counter() - started
+        sample.serializing = False
+
+
+class TimedSerializationMixin:
+    """
+    Count the time spent building serializer.data as serialization time
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSON renderer counting its time as serialization time
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed_serialization():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class MetricsRegistry:
+    """
+    Process-local histograms and counters, keyed by metric name and labels
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def record(self, prefix, labels, buckets, seconds, outcome, sample):
+        """
+        Record a request or task run of `prefix` (http_request, celery_task)
+        """
+        key = (f"{prefix}_duration_seconds", labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "bounds": buckets,
+                    "counts": [0] * (len(buckets) + 1),
+                    "sum": 0.0,
+                }
+            histogram["counts"][bisect_left(buckets, seconds)] += 1
+            histogram["sum"] += seconds
+
+            self.increment(f"{prefix}s_total", labels + (outcome,), 1)
+            if sample is not None:
+                self.increment(f"{prefix}s_sampled_total", labels, 1)
+                self.increment(f"{prefix}_db_queries_total", labels, sample.queries)
+                self.increment(f"{prefix}_db_seconds_total", labels, sample.db_seconds)
+                self.increment(
+                    f"{prefix}_serialization_seconds_total",
+                    labels,
+                    sample.serialization_seconds,
+                )
+
+    def increment(self, name, labels, amount):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            histograms = {
+                key: {
+                    "bounds": (*histogram["bounds"], math.inf),
+                    "counts": cumulative(histogram["counts"]),
+                    "sum": histogram["sum"],
+                }
+                for key, histogram in self.histograms.items()
+            }
+            return {
+                "histograms": histograms,
+                "counters": dict(self.counters),
+                "gauges": {},
+            }
+
+
+def cumulative(counts):
+    total, result = 0, []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+registry = MetricsRegistry()
+
+
+## Publishing
+
+
+def process_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def process_key(process):
+    return f"metrics:process:{process}"
+
+
+def process_snapshot():
+    """
+    Metrics of this process: requests and tasks, plus the Stripe gateway,
+    entitlement, dedup, token and connection pool stats
+    """
+    snapshot = registry.snapshot()
+    process = (("process", process_id()),)
+
+    gateway = stripe_gateway.gateway_stats()
+    for operation, histogram in gateway["latency"].items():
+        labels = (("operation", operation),)
+        snapshot["histograms"][("stripe_request_duration_seconds", labels)] = {
+            "bounds": tuple(histogram["buckets"]),
+            "counts": list(histogram["buckets"].values()),
+            "sum": histogram["sum"],
+        }
+        for outcome, count in histogram["outcomes"].items():
+            key = ("stripe_requests_total", labels + (("outcome", outcome),))
+            snapshot["counters"][key] = count
+    snapshot["gauges"][("stripe_circuit_state", process)] = CIRCUIT_STATES[
+        gateway["circuit"]
+    ]
+
+    for metric, counts in (
+        ("entitlement_cache_lookups_total", entitlement_metrics.snapshot()),
+        ("stripe_event_dedup_total", dedup_metrics.snapshot()),
+        ("auth_token_lookups_total", token_metrics.snapshot()),
+    ):
+        for result, count in counts.items():
+            if result != "hit_rate":
+                snapshot["counters"][(metric, (("result", result),))] = count
+
+    for alias, stats in get_pool_stats().items():
+        labels = (("alias", alias),) + process
+        snapshot["gauges"][("db_pool_size", labels)] = stats.get("pool_size", 0)
+        snapshot["gauges"][("db_pool_connections_in_use", labels)] = stats["in_use"]
+        snapshot["gauges"][("db_pool_requests_waiting", labels)] = stats.get(
+            "requests_waiting", 0
+        )
+    return snapshot
+
+
+def publish():
+    """
+    Store this process's snapshot in the cache for the /metrics view. The
+    snapshot expires if the process dies, which Prometheus sees as a counter
+    reset.
+    """
+    process = process_id()
+    cache.set(
+        process_key(process),
+        process_snapshot(),
+        settings.METRICS_PUBLISH_INTERVAL * 3,
+    )
+    processes = cache.get(PROCESS_INDEX_KEY) or set()
+    if process not in processes:
+        cache.set(PROCESS_INDEX_KEY, processes | {process}, None)
+
+
+class Publisher:
+    """
+    Publishes the metrics of the process every METRICS_PUBLISH_INTERVAL
+    seconds from a daemon thread, started lazily so forked workers get their
+    own
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def ensure_started(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(
+                target=self.run, name="metrics-publisher", daemon=True
+            ).start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.METRICS_PUBLISH_INTERVAL)
+            try:
+                publish()
+            except Exception as e:
+                logger.warning("Could not publish metrics: %r", e)
+
+
+publisher = Publisher()
+
+
+def collect_snapshots():
+    """
+    Snapshots of every live process, with the current one taken live.
+    Processes whose snapshot expired are dropped from the index.
+    """
+    own = process_id()
+    processes = cache.get(PROCESS_INDEX_KEY) or set()
+    snapshots = cache.get_many([process_key(process) for process in processes])
+    live = {process for process in processes if process_key(process) in snapshots}
+    if live != processes:
+        cache.set(PROCESS_INDEX_KEY, live | {own}, None)
+    snapshots[process_key(own)] = process_snapshot()
+    return list(snapshots.values())
+
+
+def merge(snapshots):
+    merged = {"histograms": {}, "counters": {}, "gauges": {}}
+    for snapshot in snapshots:
+        for key, histogram in snapshot["histograms"].items():
+            total = merged["histograms"].get(key)
+            if total is None or total["bounds"] != histogram["bounds"]:
+                merged["histograms"][key] = {
+                    "bounds": histogram["bounds"],
+                    "counts": list(histogram["counts"]),
+                    "sum": histogram["sum"],
+                }
+                continue
+            total["counts"] = [
+                a + b for a, b in zip(total["counts"], histogram["counts"])
+            ]
+            total["sum"] += histogram["sum"]
+        for kind in ("counters", "gauges"):
+            for key, value in snapshot[kind].items():
+                merged[kind][key] = merged[kind].get(key, 0) + value
+    return merged
+
+
+## Prometheus exposition
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def format_bound(bound):
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+def render(snapshot):
+    """
+    Prometheus text exposition of a (merged) snapshot
+    """
+    series = {}
+    for kind, metric_type in (
+        ("histograms", "histogram"),
+        ("counters", "counter"),
+        ("gauges", "gauge"),
+    ):
+        for (name, labels), value in snapshot[kind].items():
+            series.setdefault((name, metric_type), []).append((labels, value))
+
+    lines = []
+    for (name, metric_type), values in sorted(series.items()):
+        if name in METRIC_HELP:
+            lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(values, key=lambda item: item[0]):
+            if metric_type != "histogram":
+                lines.append(f"{name}{format_labels(labels)} {value}")
+                continue
+            for bound, count in zip(value["bounds"], value["counts"]):
+                bucket_labels = labels + (("le", format_bound(bound)),)
+                lines.append(f"{name}_bucket{format_labels(bucket_labels)} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {value['counts'][-1]}")
+    return "\n".join(lines) + "\n"
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Metrics of all live web and worker processes in Prometheus text format
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(merge(collect_snapshots())),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+## Request and task instrumentation
+
+
+class MetricsMiddleware:
+    """
+    Record the wall time of every request per URL name, and the DB and
+    serialization time of a METRICS_SAMPLE_RATE share of them
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        sample, token = start_sample()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                current_sample.reset(token)
+        self.record(request, response, time.perf_counter() - started, sample)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        sample, token = start_sample()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                current_sample.reset(token)
+        self.record(request, response, time.perf_counter() - started, sample)
+        return response
+
+    def record(self, request, response, seconds, sample):
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unmatched"
+        registry.record(
+            "http_request",
+            (("view", view),),
+            REQUEST_BUCKETS,
+            seconds,
+            ("status", response.status_code),
+            sample,
+        )
+        publisher.ensure_started()
+
+
+# Start time, sample and context token of the running tasks, by task id
+running_tasks = {}
+
+
+@task_prerun.connect
+def start_task_metrics(task_id, task, **kwargs):
+    if not settings.METRICS_ENABLED:
+        return
+    sample, token = start_sample()
+    running_tasks[task_id] = (time.perf_counter(), sample, token)
+
+
+@task_postrun.connect
+def record_task_metrics(task_id, task, state=None, **kwargs):
+    running = running_tasks.pop(task_id, None)
+    if running is None:
+        return
+    started, sample, token = running
+    if token is not None:
+        current_sample.reset(token)
+    registry.record(
+        "celery_task",
+        (("task", task.name),),
+        TASK_BUCKETS,
+        time.perf_counter() - started,
+        ("state", state or "UNKNOWN"),
+        sample,
+    )
+    publisher.ensure_started()
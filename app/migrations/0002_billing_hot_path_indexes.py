@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:44
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                fields=["user", "status"], name="invoice_user_status_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "overdue"])),
+                fields=["status", "due_date"],
+                name="invoice_open_due_date_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                fields=["subscription", "issue_date"], name="invoice_sub_issue_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                condition=models.Q(("stripe_invoice_id", ""), _negated=True),
+                fields=["stripe_invoice_id"],
+                name="invoice_stripe_id_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="paymentreminder",
+            index=models.Index(
+                fields=["invoice", "sent_date"], name="reminder_invoice_sent_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="subscription",
+            index=models.Index(
+                fields=["status", "next_billing_date"], name="sub_status_billing_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="subscription",
+            index=models.Index(fields=["user", "status"], name="sub_user_status_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="subscription",
+            index=models.Index(
+                condition=models.Q(("stripe_subscription_id", ""), _negated=True),
+                fields=["stripe_subscription_id"],
+                name="sub_stripe_id_idx",
+            ),
+        ),
+    ]
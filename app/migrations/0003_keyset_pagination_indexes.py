@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app", "0002_billing_hot_path_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="invoice_user_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="subscription",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="sub_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0004_stripe_webhook_inbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProcessedStripeEvent",
+            fields=[
+                (
+                    "event_id",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("batch_token", models.UUIDField()),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+        ),
+    ]
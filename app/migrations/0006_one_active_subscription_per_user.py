@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:57
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_no_duplicate_active_subscriptions(apps, schema_editor):
+    """
+    Stop before building the unique index while users still have several
+    active subscriptions. Cancelling them is an operator decision, made with
+    `python manage.py resolve_duplicate_subscriptions`.
+    """
+    Subscription = apps.get_model("app", "Subscription")
+    duplicates = list(
+        Subscription.objects.filter(status="active")
+        .values("user_id")
+        .annotate(active=Count("id"))
+        .filter(active__gt=1)
+        .values_list("user_id", "active")[:20]
+    )
+    if duplicates:
+        listed = ", ".join(
+            f"user {user_id} ({active})" for user_id, active in duplicates
+        )
+        raise RuntimeError(
+            "Users with several active subscriptions: "
+            f"{listed}. Resolve them with `python manage.py "
+            "resolve_duplicate_subscriptions` and run the migration again."
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app", "0005_processed_stripe_events"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            check_no_duplicate_active_subscriptions, migrations.RunPython.noop
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                # A failed concurrent build leaves an INVALID index behind
+                # (e.g. a duplicate created after the check), drop it first so
+                # the migration can be re-run
+                migrations.RunSQL(
+                    "DROP INDEX CONCURRENTLY IF EXISTS sub_one_active_per_user",
+                    migrations.RunSQL.noop,
+                ),
+                migrations.RunSQL(
+                    "CREATE UNIQUE INDEX CONCURRENTLY sub_one_active_per_user "
+                    "ON app_subscription (user_id) WHERE status = 'active'",
+                    "DROP INDEX CONCURRENTLY IF EXISTS sub_one_active_per_user",
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="subscription",
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(("status", "active")),
+                        fields=("user",),
+                        name="sub_one_active_per_user",
+                    ),
+                ),
+            ],
+        ),
+    ]
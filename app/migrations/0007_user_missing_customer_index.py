@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:11
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app", "0006_one_active_subscription_per_user"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("stripe_customer_id", "")),
+                fields=["id"],
+                name="user_missing_customer_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app", "0008_user_token_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stripewebhookevent",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="stripewebhookevent",
+            name="last_error",
+            field=models.TextField(blank=True),
+        ),
+        AddIndexConcurrently(
+            model_name="stripewebhookevent",
+            index=models.Index(
+                condition=models.Q(("processed_at__isnull", False)),
+                fields=["processed_at"],
+                name="webhook_processed_at_idx",
+            ),
+        ),
+    ]
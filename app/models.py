@@ -1,2 +1,9 @@
 from app.users.models import User
-from app.billing.models import Plan, Subscription, Invoice, PaymentReminder
+from app.billing.models import (
+    Plan,
+    Subscription,
+    Invoice,
+    PaymentReminder,
+    StripeWebhookEvent,
+    ProcessedStripeEvent,
+)
@@ -0,0 +1,95 @@
+import time
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from app.billing.tests.fixtures import (
+    create_invoices,
+    create_plan,
+    create_subscription,
+    create_user,
+)
+from app.db_router import is_pinned_to_primary, primary_pin_key
+from app.billing.catalog import plan_catalog
+from app.billing.dashboard import invalidate_dashboards
+from app.billing.entitlements import invalidate_entitlements
+from app.models import Invoice, Subscription
+from app.users.authentication import forget_token_users, issue_token
+
+
+REPLICA = "test_replica"
+
+
+@override_settings(
+    DATABASE_REPLICAS=[REPLICA],
+    SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+    REPLICA_PIN_SECONDS=1,
+)
+class ReplicaRoutingTests(TestCase):
+    """
+    Safe requests read from the replica, and a user who wrote reads from the
+    primary until the pin expires. The replica is a copy of the primary that
+    lags one invoice behind, so each read shows where it went.
+    """
+
+    databases = {"default", REPLICA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("router")
+        plan = create_plan()
+        cls.subscription = create_subscription(cls.user, plan)
+        invoice, _ = create_invoices(cls.subscription, 2)
+        for row in (cls.user, plan, cls.subscription, invoice):
+            row.save(using=REPLICA, force_insert=True)
+
+    def setUp(self):
+        cache.delete(primary_pin_key(self.user.id))
+        forget_token_users([self.user.id])
+        self.client.force_login(self.user)
+
+    def invoice_count(self):
+        response = self.client.get(reverse("invoice-list"))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["count"]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(Invoice.objects.count(), 2)
+        self.assertEqual(self.invoice_count(), 1)
+
+    def test_writer_reads_from_primary_until_pin_expires(self):
+        response = self.client.post(reverse("unsubscribe", args=[self.subscription.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(is_pinned_to_primary(self.user.id))
+        self.assertEqual(self.invoice_count(), 2)
+
+        time.sleep(1.1)
+        self.assertFalse(is_pinned_to_primary(self.user.id))
+        self.assertEqual(self.invoice_count(), 1)
+
+    def test_cache_fills_read_from_primary(self):
+        # Cached right after a write invalidated them, so a lagging replica
+        # must not be cached as fresh
+        create_plan("pro")
+        plan_catalog.invalidate()
+        Subscription.objects.using(REPLICA).update(status="cancelled")
+        invalidate_dashboards([self.user.id])
+        invalidate_entitlements([self.user.id])
+
+        self.assertEqual(self.invoice_count(), 1)
+        dashboard = self.client.get(reverse("billing-dashboard")).json()
+        self.assertEqual(dashboard["pending_invoices_count"], 2)
+        entitlement = self.client.get(reverse("my-entitlements")).json()
+        self.assertTrue(entitlement["active"])
+        plans = self.client.get(reverse("plan-list")).json()
+        self.assertEqual(plans["count"], 2)
+
+    async def test_token_writer_is_pinned_on_async_requests(self):
+        headers = {"Authorization": f"Bearer {issue_token(self.user)}"}
+        client = AsyncClient()
+        response = await client.post(
+            reverse("unsubscribe", args=[self.subscription.id]), headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = await client.get(reverse("invoice-list"), headers=headers)
+        self.assertEqual(response.json()["count"], 2)
@@ -0,0 +1,140 @@
+import copy
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    SessionAuthentication,
+    get_authorization_header,
+)
+from app.local_cache import CacheCounters, LocalTTLCache
+from app.users.models import User
+
+
+TOKEN_KEYWORD = b"bearer"
+TOKEN_SALT = "app.users.authentication"
+
+
+token_users = LocalTTLCache(settings.AUTH_TOKEN_LRU_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+token_metrics = CacheCounters(hits=("local_hits",), others=("misses", "rejected"))
+
+
+def issue_token(user):
+    """
+    Signed token carrying the user id and token version, valid for
+    AUTH_TOKEN_MAX_AGE seconds. Nothing is stored: verifying it only takes
+    the signature check and the user lookup.
+    """
+    return signing.dumps({"u": user.id, "v": user.token_version}, salt=TOKEN_SALT)
+
+
+def revoke_tokens(user):
+    """
+    Invalidate every token issued to the user so far by bumping their token
+    version. Other processes stop accepting the tokens once their cached copy
+    of the user expires, within AUTH_TOKEN_CACHE_TTL seconds.
+    """
+    User.objects.filter(id=user.id).update(token_version=F("token_version") + 1)
+    user.refresh_from_db(fields=["token_version"])
+    forget_token_users([user.id])
+
+
+def forget_token_users(user_ids):
+    token_users.delete_many(set(user_ids))
+
+
+def get_token_user(user_id):
+    """
+    Return the active user from the local LRU, loading it on a miss. The
+    caller gets its own copy, so changes to request.user stay in the request.
+    """
+    user = token_users.get(user_id)
+    if user is not None:
+        token_metrics.record("local_hits")
+    else:
+        token_metrics.record("misses")
+        user = User.objects.filter(id=user_id, is_active=True).first()
+        if user is None:
+            return None
+        token_users.set(user_id, user)
+    return copy.copy(user)
+
+
+def token_payload(request):
+    """
+    Verified payload of the request's bearer token, or None when it sends
+    none. Raises AuthenticationFailed for a malformed, forged or expired one.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != TOKEN_KEYWORD:
+        return None
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed("Invalid token header")
+
+    try:
+        return signing.loads(
+            auth[1].decode(),
+            salt=TOKEN_SALT,
+            max_age=settings.AUTH_TOKEN_MAX_AGE,
+        )
+    except (signing.BadSignature, UnicodeError):
+        token_metrics.record("rejected")
+        raise exceptions.AuthenticationFailed("Invalid or expired token")
+
+
+def token_user(payload):
+    """
+    Active user of a verified token payload, unless the token was revoked
+    """
+    user = get_token_user(payload["u"])
+    if user is None or user.token_version != payload["v"]:
+        token_metrics.record("rejected")
+        raise exceptions.AuthenticationFailed("Invalid or expired token")
+    return user
+
+
+def token_user_id(request):
+    """
+    User id of the request's bearer token, checked by its signature only, for
+    callers that need no user (e.g. the replica router)
+    """
+    try:
+        payload = token_payload(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    return payload["u"] if payload is not None else None
+
+
+async def arequest_user(request):
+    """
+    User of a plain Django async view: the bearer token user, else the
+    session user, whose unsafe requests must pass the CSRF check like with
+    DRF's SessionAuthentication. Raises AuthenticationFailed for an invalid
+    token and PermissionDenied when the CSRF check fails.
+    """
+    payload = token_payload(request)
+    if payload is not None:
+        return await sync_to_async(token_user)(payload)
+    user = await request.auser()
+    if user.is_authenticated:
+        SessionAuthentication().enforce_csrf(request)
+    return user
+
+
+class TokenAuthentication(BaseAuthentication):
+    """
+    Authenticate "Authorization: Bearer <token>" requests with the tokens of
+    issue_token. Unlike sessions there is no session row to load and no CSRF
+    check, and the user usually comes from the in-process LRU.
+    """
+
+    def authenticate(self, request):
+        payload = token_payload(request)
+        if payload is None:
+            return None
+        return token_user(payload), payload
+
+    def authenticate_header(self, request):
+        return "Bearer"
@@ -0,0 +1,85 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with PBKDF2_ITERATIONS; hashes with another count are
+    rehashed on the next login
+    """
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with the ARGON2_* cost parameters; hashes made with other
+    parameters are rehashed on the next login
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+pool_lock = threading.Lock()
+pool = None
+pool_key = None
+
+
+def hashing_pool():
+    """
+    The executor hashing runs in, created on first use in each process so
+    forked web workers do not share their parent's pool
+    """
+    global pool, pool_key
+    kind = settings.PASSWORD_HASH_POOL
+    workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count()
+    key = (os.getpid(), kind, workers)
+    with pool_lock:
+        if pool_key != key:
+            if pool is not None and pool_key[0] == os.getpid():
+                pool.shutdown(wait=False)
+            if kind == "process":
+                pool = ProcessPoolExecutor(workers, initializer=django.setup)
+            else:
+                pool = ThreadPoolExecutor(workers, thread_name_prefix="hashing")
+            pool_key = key
+        return pool
+
+
+def run_hashing(function, *args):
+    """
+    Run a hashing function in the hashing pool and wait for its result. At
+    most PASSWORD_HASH_WORKERS hashes run at once per process, so a burst of
+    logins queues up instead of taking every CPU from the other requests.
+    """
+    if settings.PASSWORD_HASH_POOL == "none":
+        return function(*args)
+    return hashing_pool().submit(function, *args).result()
+
+
+def hash_password(raw_password):
+    return run_hashing(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """
+    Whether the password matches the hash, and whether the hash should be
+    regenerated with the preferred hasher and parameters
+    """
+    return run_hashing(hashers.verify_password, raw_password, encoded)
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from app.users.hashers import hash_password, verify_password
 
 
 class User(AbstractUser):
@@ -8,6 +9,8 @@ class User(AbstractUser):
     stripe_customer_id = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped to revoke every API token issued to the user so far
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -31,3 +34,29 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.email
+
+    def set_password(self, raw_password):
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Verify the password in the hashing pool, rehashing it when the
+        preferred hasher or its parameters changed
+        """
+        is_correct, must_update = verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=["password"])
+        return is_correct
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="user_missing_customer_idx",
+                condition=models.Q(stripe_customer_id=""),
+            ),
+        ]
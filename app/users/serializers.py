@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from app.metrics import TimedSerializationMixin
 from app.users.models import User
 
 
@@ -52,7 +53,7 @@ class UserLoginSerializer(serializers.Serializer):
         return attrs
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializationMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = (
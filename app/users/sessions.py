@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+from app.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def purge_expired_sessions(batch_size=None):
+    """
+    Delete expired django_session rows in batches, so the sweep never holds
+    a long-running delete on the table. Only the db and cached_db stores keep
+    rows; cache entries and signed cookies expire by themselves.
+    """
+    if settings.SESSION_STORE not in ("db", "cached_db"):
+        return 0
+
+    batch_size = batch_size or settings.SESSION_PURGE_BATCH_SIZE
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    purged = 0
+    while True:
+        keys = list(expired.values_list("pk", flat=True)[:batch_size])
+        if not keys:
+            break
+        purged += Session.objects.filter(pk__in=keys).delete()[0]
+
+    logger.info("Purged %d expired sessions", purged)
+    return purged
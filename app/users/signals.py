@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from app.users.authentication import forget_token_users
+from app.users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_token_user(sender, instance, **kwargs):
+    """
+    Drop the cached copy of a user once a change to them (e.g. deactivation)
+    is committed
+    """
+    user_id = instance.id
+    transaction.on_commit(lambda: forget_token_users([user_id]))
@@ -0,0 +1,17 @@
+from app.celery.celery import saas_project_celery_app
+from app.users.sessions import purge_expired_sessions
+
+
+@saas_project_celery_app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+    queue="sheduled_tasks",
+)
+def purge_sessions(*args):
+    """
+    Sweep the expired sessions out of the session table
+    """
+    purged = purge_expired_sessions()
+    return f"Purged {purged} expired sessions"
@@ -0,0 +1,29 @@
+from unittest import mock
+from kombu.exceptions import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+from app.billing.tasks import provision_stripe_customers
+from app.users.models import User
+
+
+class RegisterTests(TestCase):
+    def register(self):
+        return self.client.post(
+            reverse("register"),
+            {
+                "email": "register@example.com",
+                "username": "register",
+                "password": "register-password",
+                "password_confirm": "register-password",
+            },
+            content_type="application/json",
+        )
+
+    def test_broker_outage_does_not_fail_registration(self):
+        with mock.patch.object(
+            provision_stripe_customers, "delay", side_effect=OperationalError
+        ), self.assertLogs("django.test", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.filter(username="register").exists())
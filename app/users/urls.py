@@ -5,5 +5,7 @@ urlpatterns = [
     path("register/", views.register, name="register"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
+    path("token/", views.token_view, name="token"),
+    path("token/revoke/", views.revoke_tokens_view, name="revoke-tokens"),
     path("profile/", views.profile, name="profile"),
 ]
@@ -2,8 +2,12 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import login, logout
+from django.db import transaction
 from app.users.models import User
+from app.billing.tasks import provision_stripe_customers
+from app.users.authentication import issue_token, revoke_tokens
 from app.users.serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -16,7 +20,13 @@ from app.users.serializers import (
 def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
+        with transaction.atomic():
+            user = serializer.save()
+            # robust: with the broker down the user still gets their 201, and
+            # provision_missing_stripe_customers creates the customer later
+            transaction.on_commit(
+                lambda: provision_stripe_customers.delay([user.id]), robust=True
+            )
         return Response(
             {
                 "message": "User registered successfully",
@@ -31,7 +41,6 @@ def register(request):
 @permission_classes([AllowAny])
 def login_view(request):
     serializer = UserLoginSerializer(data=request.data)
-    print("-------------------------------------------------------")
     if serializer.is_valid():
         user = serializer.validated_data["user"]
         login(request, user)
@@ -42,6 +51,26 @@ def login_view(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def token_view(request):
+    serializer = UserLoginSerializer(data=request.data)
+    if serializer.is_valid():
+        user = serializer.validated_data["user"]
+        return Response(
+            {"token": issue_token(user), "expires_in": settings.AUTH_TOKEN_MAX_AGE},
+            status=status.HTTP_200_OK,
+        )
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def revoke_tokens_view(request):
+    revoke_tokens(request.user)
+    return Response({"message": "Tokens revoked"}, status=status.HTTP_200_OK)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
@@ -0,0 +1,117 @@
+"""
+Concurrent request capacity of one worker for the Stripe payment intent
+endpoint under simulated Stripe latency, with CLIENTS clients sending requests:
+the sync view on a gthread-sized thread pool against the async view on a
+single event loop. The fake Stripe server (benchmarks/fake_stripe.py) answers
+every call after STRIPE_LATENCY seconds.
+
+Requires uvicorn (see requirements.txt).
+Run with: python manage.py shell < benchmarks/async_stripe_capacity.py
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from django.test import AsyncRequestFactory, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from app.models import User, Plan, Subscription, Invoice
+from app.billing import async_views, stripe_gateway, views
+from benchmarks import fake_stripe
+
+
+STRIPE_LATENCY = float(os.getenv("STRIPE_LATENCY", 0.2))
+REQUESTS = 500
+CLIENTS = int(os.getenv("CLIENTS", 64))
+THREADS = int(os.getenv("GUNICORN_THREADS", 8))
+FAKE_STRIPE_PORT = 12111
+FAKE_STRIPE_URL = f"http://127.0.0.1:{FAKE_STRIPE_PORT}"
+
+
+def create_invoice():
+    User.objects.filter(username="async-benchmark").delete()
+    user = User.objects.create(
+        username="async-benchmark",
+        email="async-benchmark@example.com",
+        stripe_customer_id="cus_benchmark",
+    )
+    plan = Plan.objects.order_by("price").first()
+    subscription = Subscription.objects.create(user=user, plan=plan, status="active")
+    return Invoice.objects.create(
+        user=user, subscription=subscription, plan=plan, amount=plan.price
+    )
+
+
+def run_sync(invoice):
+    factory = APIRequestFactory()
+    path = f"/billing/invoices/{invoice.id}/stripe-payment/"
+
+    def call(_):
+        request = factory.post(path)
+        force_authenticate(request, user=invoice.user)
+        try:
+            return views.create_stripe_payment_intent(
+                request, invoice_id=invoice.id
+            ).status_code
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return list(executor.map(call, range(REQUESTS)))
+
+
+def run_async(invoice):
+    factory = AsyncRequestFactory()
+    path = f"/billing/invoices/{invoice.id}/stripe-payment/"
+
+    async def auser():
+        return invoice.user
+
+    async def call(clients):
+        async with clients:
+            request = factory.post(path)
+            request.auser = auser
+            response = await async_views.create_stripe_payment_intent(
+                request, invoice_id=invoice.id
+            )
+            return response.status_code
+
+    async def main():
+        clients = asyncio.Semaphore(CLIENTS)
+        return await asyncio.gather(*(call(clients) for _ in range(REQUESTS)))
+
+    return asyncio.run(main())
+
+
+def report(label, run, invoice):
+    stripe_gateway.reset_clients()
+    started = time.perf_counter()
+    statuses = run(invoice)
+    elapsed = time.perf_counter() - started
+    throughput = len(statuses) / elapsed
+    print(
+        f"{label:>24}: {throughput:7.1f} req/s, "
+        f"~{throughput * STRIPE_LATENCY:5.1f} requests in flight, "
+        f"{statuses.count(200)}/{len(statuses)} OK"
+    )
+
+
+def run_benchmark():
+    server = fake_stripe.start(FAKE_STRIPE_PORT, latency=STRIPE_LATENCY)
+    invoice = create_invoice()
+    print(
+        f"Simulated Stripe latency: {STRIPE_LATENCY * 1000:.0f} ms, "
+        f"{CLIENTS} concurrent clients"
+    )
+    try:
+        with override_settings(
+            STRIPE_API_BASE=FAKE_STRIPE_URL, STRIPE_SECRET_KEY="sk_test_benchmark"
+        ):
+            report(f"sync ({THREADS} threads)", run_sync, invoice)
+            report("async (1 event loop)", run_async, invoice)
+    finally:
+        fake_stripe.stop(server)
+        invoice.user.delete()
+
+
+run_benchmark()
@@ -0,0 +1,92 @@
+"""
+Requests per second of an authenticated endpoint with session
+authentication, with a bearer token whose user is in the local LRU, and with
+a bearer token whose user is loaded on every request, plus the DB queries
+each of them makes per request.
+
+Run with: python manage.py shell < benchmarks/auth_throughput.py
+"""
+import statistics
+import time
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from app.models import User
+from app.users.authentication import issue_token, revoke_tokens, token_users
+
+
+PATH = "/api/users/profile/"
+REQUESTS = 500
+ROUNDS = 5
+
+
+def create_user():
+    User.objects.filter(username="auth-benchmark").delete()
+    return User.objects.create_user(
+        username="auth-benchmark",
+        email="auth-benchmark@example.com",
+        password="auth-benchmark-password",
+    )
+
+
+def session_client(user):
+    client = Client(enforce_csrf_checks=True)
+    client.force_login(user)
+    return client, None
+
+
+def token_client(user, cold=False):
+    client = Client(HTTP_AUTHORIZATION=f"Bearer {issue_token(user)}")
+    return client, token_users.clear if cold else None
+
+
+def requests_per_second(client, before_request):
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        if before_request:
+            before_request()
+        response = client.get(PATH)
+    assert response.status_code == 200, response.status_code
+    return REQUESTS / (time.perf_counter() - started)
+
+
+def queries_per_request(client, before_request):
+    client.get(PATH)
+    if before_request:
+        before_request()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(PATH)
+    return len(queries)
+
+
+def run_benchmark():
+    user = create_user()
+    modes = {
+        "session": session_client(user),
+        "token, cached": token_client(user),
+        "token, uncached": token_client(user, cold=True),
+    }
+    try:
+        # Modes are interleaved round by round so drift affects them alike
+        rates = {mode: [] for mode in modes}
+        for _ in range(ROUNDS):
+            for mode, (client, before_request) in modes.items():
+                rates[mode].append(requests_per_second(client, before_request))
+
+        baseline = statistics.median(rates["session"])
+        print(f"GET {PATH}, {REQUESTS} requests x {ROUNDS} rounds")
+        for mode, (client, before_request) in modes.items():
+            rate = statistics.median(rates[mode])
+            print(
+                f"  {mode:>16}: {rate:8.0f} req/s ({rate / baseline:.2f}x), "
+                f"{queries_per_request(client, before_request)} queries/request"
+            )
+
+        revoke_tokens(user)
+        client, _ = modes["token, cached"]
+        print(f"  after revocation: HTTP {client.get(PATH).status_code}")
+    finally:
+        user.delete()
+
+
+run_benchmark()
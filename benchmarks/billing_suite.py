@@ -0,0 +1,456 @@
+"""
+Billing benchmark suite. For each data size in BENCHMARK_SIZES (number of
+users) the database is rebuilt with synthetic data
+(benchmarks/synthetic_data.py). The suite then times:
+- every Celery task of app/billing/tasks.py, run as one billing run;
+- every endpoint of app/billing/urls.py and app/users/urls.py, over
+  BENCHMARK_REQUESTS requests each.
+The results are written as JSON to BENCHMARK_OUTPUT. Compare two runs with
+benchmarks/compare_results.py.
+
+Every size starts from an empty database (manage.py flush) and a cleared
+cache, so point it at a dedicated database. On Postgres, set DB_NAME. On
+SQLite, set DB_ENGINE=sqlite and SQLITE_PATH and run
+python manage.py migrate --run-syncdb first. CACHE_URL=locmem:// runs it
+without Redis. Celery tasks run eagerly in this process. Stripe is the
+local fake (benchmarks/fake_stripe.py).
+
+Requires uvicorn (see requirements.txt).
+Run with: python manage.py shell < benchmarks/billing_suite.py
+"""
+import hashlib
+import hmac
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import uuid
+from collections import Counter, defaultdict
+from celery.signals import task_postrun, task_prerun
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from app.models import User, Plan, Subscription, Invoice
+from app.celery.celery import saas_project_celery_app
+from app.billing import stripe_gateway
+from app.billing import tasks
+from app.billing.dashboard import OPEN_INVOICE_STATUSES
+from app.billing.entitlements import local_entitlements
+from app.users.authentication import issue_token
+from benchmarks import fake_stripe, synthetic_data
+
+
+SIZES = [
+    int(size) for size in os.getenv("BENCHMARK_SIZES", "1000,10000,100000").split(",")
+]
+REQUESTS = int(os.getenv("BENCHMARK_REQUESTS", 50))
+STRIPE_LATENCY = float(os.getenv("STRIPE_LATENCY", 0))
+FAKE_STRIPE_PORT = 12113
+WEBHOOK_SECRET = "whsec_benchmark"
+TASK_PREFIX = "app.billing.tasks."
+
+
+class TaskTimer:
+    """
+    Wall time of every task execution, including the shard, callback and
+    delivery tasks a top-level task runs eagerly
+    """
+
+    def __init__(self):
+        self.started = {}
+        self.timings = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        task_prerun.connect(self.prerun, weak=False)
+        task_postrun.connect(self.postrun, weak=False)
+
+    def prerun(self, task_id, task, **kwargs):
+        self.started[task_id] = time.perf_counter()
+
+    def postrun(self, task_id, task, **kwargs):
+        started = self.started.pop(task_id, None)
+        if started is not None:
+            timing = self.timings[task.name]
+            timing["count"] += 1
+            timing["seconds"] += time.perf_counter() - started
+
+    def reset(self):
+        self.timings.clear()
+
+
+def git_commit():
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return result.stdout.strip() or "unknown"
+
+
+def reset_database():
+    if User.objects.exclude(
+        username__startswith=synthetic_data.USERNAME_PREFIX
+    ).exists():
+        raise SystemExit(
+            "The database has non-synthetic users, refusing to flush it. "
+            "Run the benchmark suite against a dedicated database."
+        )
+    call_command("flush", interactive=False, verbosity=0)
+    cache.clear()
+    local_entitlements.clear()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def summarize(durations, queries, statuses):
+    return {
+        "requests": len(durations),
+        "mean_ms": statistics.mean(durations) * 1000,
+        "p50_ms": percentile(durations, 0.5) * 1000,
+        "p95_ms": percentile(durations, 0.95) * 1000,
+        "max_ms": max(durations) * 1000,
+        "queries": statistics.median(queries),
+        "statuses": dict(Counter(statuses)),
+    }
+
+
+## Tasks
+
+
+def billing_run():
+    """
+    Top-level tasks with their arguments, in the order of a daily billing run
+    """
+    missing_customers = list(
+        User.objects.filter(stripe_customer_id="").values_list("id", flat=True)[
+            : synthetic_data.CHUNK_SIZE
+        ]
+    )
+    open_invoice = Invoice.objects.filter(status__in=OPEN_INVOICE_STATUSES).first()
+    event_id = f"evt_{uuid.uuid4().hex[:24]}"
+    return [
+        (tasks.drain_stripe_webhook_inbox, ()),
+        (tasks.generate_invoices_for_active_subscriptions, ("benchmark",)),
+        (tasks.mark_overdue_invoices, ("benchmark",)),
+        (tasks.send_payment_reminders, ("benchmark",)),
+        (tasks.purge_expired_stripe_events, ("benchmark",)),
+        (tasks.provision_stripe_customers, (missing_customers[::2],)),
+        (tasks.provision_missing_stripe_customers, ("benchmark",)),
+        (
+            tasks.process_stripe_webhook,
+            (
+                {
+                    "id": event_id,
+                    "type": "invoice.payment_succeeded",
+                    "data": {"object": {"id": open_invoice.stripe_invoice_id}},
+                },
+            ),
+        ),
+    ]
+
+
+def run_tasks(size, timer):
+    results = []
+    saas_project_celery_app.conf.task_always_eager = True
+    try:
+        for task, args in billing_run():
+            timer.reset()
+            started = time.perf_counter()
+            result = task.apply(args=args).get()
+            elapsed = time.perf_counter() - started
+            results.append(
+                {
+                    "kind": "task",
+                    "name": task.name,
+                    "size": size,
+                    "seconds": elapsed,
+                    "result": str(result),
+                    "subtasks": {
+                        name: dict(timing)
+                        for name, timing in timer.timings.items()
+                        if name != task.name
+                    },
+                }
+            )
+            print(f"  task {task.name.removeprefix(TASK_PREFIX):>40}: {elapsed:8.3f} s")
+    finally:
+        saas_project_celery_app.conf.task_always_eager = False
+        mail.outbox = []
+    return results
+
+
+## Endpoints
+
+
+def logged_in(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def with_token(user):
+    return Client(HTTP_AUTHORIZATION=f"Bearer {issue_token(user)}")
+
+
+def get(client, url):
+    return lambda: client.get(url)
+
+
+def post(client, url, data=None):
+    return lambda: client.post(url, data or {}, content_type="application/json")
+
+
+def signed_webhook(client, url, event_type):
+    event_id = f"evt_{uuid.uuid4().hex[:24]}"
+    payload = json.dumps(
+        {"id": event_id, "type": event_type, "data": {"object": {"id": "in_x"}}}
+    )
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return lambda: client.post(
+        url,
+        payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+    )
+
+
+def endpoint_calls():
+    """
+    REQUESTS prepared calls per URL name. Calls that change state each get
+    their own user, subscription or invoice.
+    """
+    synthetic = User.objects.filter(username__startswith=synthetic_data.USERNAME_PREFIX)
+    # The longest-standing active subscriber has the most history to page
+    member = (
+        Subscription.objects.filter(status="active")
+        .select_related("user")
+        .order_by("start_date")
+        .first()
+        .user
+    )
+    admin = User.objects.create_user(
+        username=f"{synthetic_data.USERNAME_PREFIX}admin",
+        email=f"{synthetic_data.USERNAME_PREFIX}admin@example.com",
+        password=synthetic_data.PASSWORD,
+        is_staff=True,
+    )
+    member_client, admin_client, anonymous = (
+        logged_in(member),
+        logged_in(admin),
+        Client(),
+    )
+    latest_invoice = Invoice.objects.filter(user=member).order_by("-created_at").first()
+    plan = Plan.objects.order_by("price").first()
+
+    unsubscribed = list(
+        synthetic.exclude(subscriptions__status="active").order_by("id")[:REQUESTS]
+    )
+    active = list(
+        Subscription.objects.filter(status="active")
+        .exclude(user=member)
+        .select_related("user")
+        .order_by("id")[:REQUESTS]
+    )
+    open_invoices = list(
+        Invoice.objects.filter(status__in=OPEN_INVOICE_STATUSES)
+        .exclude(user=member)
+        .select_related("user")
+        .order_by("id")[: REQUESTS * 2]
+    )
+    to_pay, to_charge = open_invoices[:REQUESTS], open_invoices[REQUESTS:]
+    others = list(synthetic.order_by("-id")[:REQUESTS])
+
+    calls = {
+        "plan-list": [get(anonymous, reverse("plan-list"))] * REQUESTS,
+        "subscription-list": [get(member_client, reverse("subscription-list"))]
+        * REQUESTS,
+        "subscribe": [
+            post(logged_in(user), reverse("subscribe"), {"plan": str(plan.id)})
+            for user in unsubscribed
+        ],
+        "unsubscribe": [
+            post(
+                logged_in(subscription.user),
+                reverse("unsubscribe", args=[subscription.id]),
+            )
+            for subscription in active
+        ],
+        "invoice-list": [get(member_client, reverse("invoice-list"))] * REQUESTS,
+        "invoice-detail": [
+            get(member_client, reverse("invoice-detail", args=[latest_invoice.id]))
+        ]
+        * REQUESTS,
+        "pay-invoice": [
+            post(logged_in(invoice.user), reverse("pay-invoice", args=[invoice.id]))
+            for invoice in to_pay
+        ],
+        "stripe-payment": [
+            post(logged_in(invoice.user), reverse("stripe-payment", args=[invoice.id]))
+            for invoice in to_charge
+        ],
+        "billing-dashboard": [get(member_client, reverse("billing-dashboard"))]
+        * REQUESTS,
+        "my-entitlements": [get(member_client, reverse("my-entitlements"))] * REQUESTS,
+        "entitlement-stats": [get(admin_client, reverse("entitlement-stats"))]
+        * REQUESTS,
+        "user-entitlements": [
+            get(admin_client, reverse("user-entitlements", args=[user.id]))
+            for user in others
+        ],
+        "stripe-webhook": [
+            signed_webhook(
+                anonymous, reverse("stripe-webhook"), "invoice.payment_failed"
+            )
+            for _ in range(REQUESTS)
+        ],
+        "register": [
+            post(
+                anonymous,
+                reverse("register"),
+                {
+                    "email": f"{synthetic_data.USERNAME_PREFIX}new{index}@example.com",
+                    "username": f"{synthetic_data.USERNAME_PREFIX}new{index}",
+                    "password": synthetic_data.PASSWORD,
+                    "password_confirm": synthetic_data.PASSWORD,
+                },
+            )
+            for index in range(REQUESTS)
+        ],
+        "login": [
+            post(
+                Client(),
+                reverse("login"),
+                {"email": user.email, "password": synthetic_data.PASSWORD},
+            )
+            for user in others
+        ],
+        "logout": [post(logged_in(user), reverse("logout")) for user in others],
+        "profile": [get(member_client, reverse("profile"))] * REQUESTS,
+        "profile (token)": [get(with_token(member), reverse("profile"))] * REQUESTS,
+        "token": [
+            post(
+                Client(),
+                reverse("token"),
+                {"email": user.email, "password": synthetic_data.PASSWORD},
+            )
+            for user in others
+        ],
+        "revoke-tokens": [
+            post(with_token(user), reverse("revoke-tokens")) for user in others
+        ],
+    }
+    return calls
+
+
+def run_endpoints(size):
+    results = []
+    for name, calls in endpoint_calls().items():
+        durations, queries, statuses = [], [], []
+        for call in calls:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = call()
+                durations.append(time.perf_counter() - started)
+            queries.append(len(captured))
+            statuses.append(response.status_code)
+        if not durations:
+            print(f"  endpoint {name:>38}: no data to benchmark at this size")
+            continue
+
+        summary = summarize(durations, queries, statuses)
+        results.append({"kind": "endpoint", "name": name, "size": size, **summary})
+        print(
+            f"  endpoint {name:>38}: p50 {summary['p50_ms']:7.2f} ms, "
+            f"p95 {summary['p95_ms']:7.2f} ms, {summary['queries']:g} queries, "
+            f"{summary['statuses']}"
+        )
+    return results
+
+
+def report_coverage(results):
+    """
+    Warn about tasks and URLs the suite does not exercise, e.g. new ones
+    """
+    timed = {result["name"] for result in results}
+    for result in results:
+        timed.update(result.get("subtasks", {}))
+    task_names = {
+        name for name in saas_project_celery_app.tasks if name.startswith(TASK_PREFIX)
+    }
+    url_names = {
+        pattern.name
+        for module in ("app.billing.urls", "app.users.urls")
+        for pattern in get_resolver(module).url_patterns
+    }
+    for name in sorted((task_names | url_names) - timed):
+        print(f"Not benchmarked: {name}")
+
+
+def run_benchmark():
+    commit = git_commit()
+    output = os.getenv("BENCHMARK_OUTPUT") or f"benchmark-results-{commit}.json"
+    timer = TaskTimer()
+    results = []
+    saas_project_celery_app.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        task_eager_propagates=True,
+    )
+    server = fake_stripe.start(FAKE_STRIPE_PORT, latency=STRIPE_LATENCY)
+    try:
+        with override_settings(
+            STRIPE_API_BASE=f"http://127.0.0.1:{FAKE_STRIPE_PORT}",
+            STRIPE_SECRET_KEY="sk_test_benchmark",
+            STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+        ):
+            stripe_gateway.reset_clients()
+            for size in SIZES:
+                reset_database()
+                started = time.perf_counter()
+                rows = synthetic_data.generate(size)
+                elapsed = time.perf_counter() - started
+                print(f"{size} users: generated {rows} in {elapsed:.1f} s")
+                results.append(
+                    {
+                        "kind": "generate",
+                        "name": "synthetic_data",
+                        "size": size,
+                        "seconds": elapsed,
+                        "rows": rows,
+                    }
+                )
+                results.extend(run_tasks(size, timer))
+                results.extend(run_endpoints(size))
+    finally:
+        fake_stripe.stop(server)
+
+    report_coverage(results)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "sizes": SIZES,
+                "requests": REQUESTS,
+                "stripe_latency": STRIPE_LATENCY,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Wrote {len(results)} results to {output}")
+
+
+run_benchmark()
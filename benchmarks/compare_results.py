@@ -0,0 +1,75 @@
+"""
+Compare two result files of benchmarks/billing_suite.py, e.g. from the base
+and head commits of a change, and flag the tasks and endpoints that got
+slower by more than the threshold. Exits with status 1 when there are
+regressions.
+
+Run with: python benchmarks/compare_results.py base.json head.json [--threshold 1.2]
+"""
+import argparse
+import json
+import sys
+
+
+# Metric compared per result kind
+METRICS = {"generate": "seconds", "task": "seconds", "endpoint": "p50_ms"}
+# Smaller absolute changes are run-to-run noise, whatever the ratio
+NOISE_FLOOR = {"seconds": 0.01, "p50_ms": 0.5}
+
+
+def load(path):
+    with open(path) as f:
+        run = json.load(f)
+    return run, {
+        (result["kind"], result["name"], result["size"]): result
+        for result in run["results"]
+    }
+
+
+def compare(base_path, head_path, threshold):
+    base_run, base = load(base_path)
+    head_run, head = load(head_path)
+    print(
+        f"{base_run['commit']} ({base_run['database']}) -> "
+        f"{head_run['commit']} ({head_run['database']})"
+    )
+
+    regressions = 0
+    for key in sorted(base.keys() & head.keys(), key=lambda key: (key[2], key)):
+        kind, name, size = key
+        metric = METRICS[kind]
+        before, after = base[key][metric], head[key][metric]
+        ratio = after / before if before else 1.0
+        flag = ""
+        if ratio > threshold and after - before > NOISE_FLOOR[metric]:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(
+            f"{size:>9} {kind:>8} {name:>45}: {before:10.3f} -> {after:10.3f} "
+            f"{metric} ({ratio:.2f}x){flag}"
+        )
+
+    for key in sorted(base.keys() ^ head.keys(), key=lambda key: (key[2], key)):
+        side = "base" if key in base else "head"
+        print(f"Only in {side}: {key}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="slowdown ratio reported as a regression (default 1.2)",
+    )
+    args = parser.parse_args()
+    regressions = compare(args.base, args.head, args.threshold)
+    print(f"{regressions} regressions above {args.threshold}x")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
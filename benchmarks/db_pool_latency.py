@@ -0,0 +1,62 @@
+"""
+Per-request database latency with a fresh connection per request versus the
+psycopg connection pool. Each simulated request checks out a connection, runs
+a primary-key lookup and releases the connection, as a Django request would.
+
+Requires PostgreSQL (the default DATABASES configuration).
+Run with: python manage.py shell < benchmarks/db_pool_latency.py
+"""
+import copy
+import statistics
+import time
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+
+REQUESTS = 500
+
+
+def build_wrapper(alias, pool):
+    settings_dict = copy.deepcopy(connection.settings_dict)
+    settings_dict["CONN_MAX_AGE"] = 0
+    options = settings_dict.setdefault("OPTIONS", {})
+    options.pop("pool", None)
+    if pool:
+        options["pool"] = {"min_size": 1, "max_size": 4}
+    return DatabaseWrapper(settings_dict, alias=alias)
+
+
+def measure(wrapper):
+    latencies = []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT id FROM app_plan ORDER BY price LIMIT 1")
+            cursor.fetchall()
+        wrapper.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "mean": statistics.fmean(latencies),
+    }
+
+
+def run_benchmark():
+    if connection.vendor != "postgresql":
+        print("The pool benchmark needs PostgreSQL")
+        return
+
+    for label, pool in (("fresh connection", False), ("psycopg pool", True)):
+        wrapper = build_wrapper(f"bench_{label.replace(' ', '_')}", pool)
+        result = measure(wrapper)
+        if pool:
+            wrapper.close_pool()
+        print(
+            f"{label:>16}: p50 {result['p50']:.2f} ms, "
+            f"p99 {result['p99']:.2f} ms, mean {result['mean']:.2f} ms"
+        )
+
+
+run_benchmark()
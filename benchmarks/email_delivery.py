@@ -0,0 +1,83 @@
+"""
+Reminder email delivery throughput against a local SMTP stand-in server,
+comparing one connection per message with the pooled, batched mailer.
+
+Requires aiosmtpd (pip install aiosmtpd).
+Run with: python manage.py shell < benchmarks/email_delivery.py
+"""
+import time
+import uuid
+from datetime import timedelta
+from aiosmtpd.controller import Controller
+from django.test import override_settings
+from django.utils import timezone
+from app.models import User, Plan, Invoice
+from app.billing.mailer import (
+    build_payment_reminder_email,
+    connection_pool,
+    send_batched,
+)
+
+
+MESSAGE_COUNT = 500
+SMTP_PORT = 8025
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def build_messages():
+    now = timezone.now()
+    plan = Plan(name="Pro", plan_type="pro", price="19.99")
+    messages = []
+    for index in range(MESSAGE_COUNT):
+        invoice = Invoice(
+            id=uuid.uuid4(),
+            user=User(username=f"user{index}", email=f"user{index}@example.com"),
+            plan=plan,
+            amount=plan.price,
+            due_date=now - timedelta(days=3),
+        )
+        messages.append((index, build_payment_reminder_email(invoice)))
+    return messages
+
+
+def run_benchmark():
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+    try:
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=SMTP_PORT,
+            EMAIL_USE_TLS=False,
+            EMAIL_RATE_LIMIT=0,
+        ):
+            messages = build_messages()
+
+            started = time.perf_counter()
+            for _, message in messages:
+                message.send()
+            unpooled_rate = len(messages) / (time.perf_counter() - started)
+
+            connection_pool.close()
+            started = time.perf_counter()
+            delivered = send_batched(messages)
+            pooled_rate = len(delivered) / (time.perf_counter() - started)
+            connection_pool.close()
+    finally:
+        controller.stop()
+
+    assert handler.received == 2 * MESSAGE_COUNT, handler.received
+    print(f"connection per message: {unpooled_rate:,.0f} msg/s")
+    print(f"pooled, batched:        {pooled_rate:,.0f} msg/s")
+
+
+run_benchmark()
@@ -0,0 +1,69 @@
+"""
+Local stand-in for the Stripe API used by the benchmarks. It answers the
+customer and payment intent endpoints after a fixed latency, or fails every
+call with `status` to simulate a degraded Stripe.
+
+Requires uvicorn (see requirements.txt).
+"""
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+import uuid
+import uvicorn
+
+
+OBJECT_PREFIXES = {"/v1/customers": "cus", "/v1/payment_intents": "pi"}
+
+
+def make_app(latency, status):
+    async def fake_stripe(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        while (await receive()).get("more_body"):
+            pass
+        await asyncio.sleep(latency)
+
+        if status >= 400:
+            body = {"error": {"type": "api_error", "message": "Fake Stripe failure"}}
+        else:
+            prefix = OBJECT_PREFIXES.get(scope["path"], "obj")
+            object_id = f"{prefix}_{uuid.uuid4().hex[:24]}"
+            body = {"id": object_id, "client_secret": f"{object_id}_secret"}
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+    return fake_stripe
+
+
+def start(port, latency=0.0, status=200):
+    """
+    Serve the fake Stripe API from its own process, so it does not compete
+    with the benchmarked code for the GIL. Returns the process.
+    """
+    server = multiprocessing.get_context("fork").Process(
+        target=uvicorn.run,
+        args=(make_app(latency, status),),
+        kwargs={"port": port, "log_level": "warning", "lifespan": "off"},
+        daemon=True,
+    )
+    server.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return server
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+
+
+def stop(server):
+    server.terminate()
+    server.join()
@@ -0,0 +1,128 @@
+"""
+Caller-side cost of logging: time per record spent in the logging call with
+the old synchronous text handler and with the queue-backed JSON pipeline,
+the cost of a disabled DEBUG call with an f-string and with lazy arguments,
+and the worst stalls of a burst of records while the sink is slow.
+
+Run with: python manage.py shell < benchmarks/logging_overhead.py
+"""
+import logging
+import os
+import statistics
+import time
+from app.logger import TEXT_FORMAT, build_formatter, start_queue_pipeline
+
+
+RECORDS = 20000
+BURST = 100000
+# Seconds the slow sink takes per write, e.g. a blocked pipe or slow disk
+SINK_DELAY = 0.0005
+# Queue bound for the burst, so it overflows like LOG_QUEUE_SIZE would
+QUEUE_SIZE = 10000
+
+
+class SlowHandler(logging.StreamHandler):
+    """
+    Writes to /dev/null, taking `delay` seconds more per record
+    """
+
+    def __init__(self, delay=0.0):
+        super().__init__(open(os.devnull, "w"))
+        self.delay = delay
+
+    def emit(self, record):
+        super().emit(record)
+        if self.delay:
+            time.sleep(self.delay)
+
+
+def isolated_logger(name, handler):
+    logger = logging.getLogger(f"benchmark.{name}")
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def per_record(logger, count=RECORDS):
+    started = time.perf_counter()
+    for i in range(count):
+        logger.info("Generated %d invoices in %d chunks", i, i // 1000)
+    return (time.perf_counter() - started) / count
+
+
+def sync_text(delay=0.0):
+    handler = SlowHandler(delay)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return isolated_logger("sync", handler), None
+
+
+def queue_json(delay=0.0, queue_size=RECORDS * 2):
+    target = SlowHandler(delay)
+    target.setFormatter(build_formatter("json"))
+    handler, listener = start_queue_pipeline(target, queue_size)
+    return isolated_logger("queue", handler), listener
+
+
+def measure_handlers():
+    print(f"Per-record caller cost ({RECORDS} records)")
+    for label, build in (("sync text", sync_text), ("queue json", queue_json)):
+        logger, listener = build()
+        cost = per_record(logger)
+        if listener:
+            listener.stop()
+        print(f"  {label:>12}: {cost * 1e6:7.2f} us/record")
+
+
+def measure_disabled():
+    logger, _ = sync_text()
+    invoices, chunks = 1000, 10
+    count = RECORDS * 10
+
+    started = time.perf_counter()
+    for _ in range(count):
+        logger.debug(f"Billed chunk {chunks} ({invoices} subscriptions)")
+    eager = (time.perf_counter() - started) / count
+
+    started = time.perf_counter()
+    for _ in range(count):
+        logger.debug("Billed chunk %d (%d subscriptions)", chunks, invoices)
+    lazy = (time.perf_counter() - started) / count
+
+    print(f"Disabled DEBUG call ({count} calls)")
+    print(f"  {'f-string':>12}: {eager * 1e9:7.0f} ns/call")
+    print(f"  {'lazy args':>12}: {lazy * 1e9:7.0f} ns/call")
+
+
+def measure_burst():
+    print(f"Caller stalls in a {BURST} record burst, sink {SINK_DELAY * 1000} ms/write")
+    # The synchronous handler is timed on a slice: the full burst would take
+    # BURST * SINK_DELAY seconds
+    for label, logger, listener, count in (
+        ("sync text", *sync_text(SINK_DELAY), 2000),
+        ("queue json", *queue_json(SINK_DELAY, QUEUE_SIZE), BURST),
+    ):
+        stalls = []
+        for i in range(count):
+            started = time.perf_counter()
+            logger.info("Processed %d events", i)
+            stalls.append(time.perf_counter() - started)
+        dropped = getattr(logger.handlers[0], "dropped", 0)
+        if listener:
+            listener.stop()
+        stalls.sort()
+        p99 = stalls[int(len(stalls) * 0.99)]
+        print(
+            f"  {label:>12}: p50 {statistics.median(stalls) * 1e6:8.1f} us, "
+            f"p99 {p99 * 1e6:8.1f} us, max {stalls[-1] * 1e6:8.1f} us, "
+            f"{dropped} dropped of {count}"
+        )
+
+
+def run_benchmark():
+    measure_handlers()
+    measure_disabled()
+    measure_burst()
+
+
+run_benchmark()
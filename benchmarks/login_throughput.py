@@ -0,0 +1,125 @@
+"""
+Login throughput per core for each password hasher setting, and the latency
+of a cheap endpoint while a burst of logins runs, with hashing inline in
+the request threads and in the hashing pool.
+
+Run with: python manage.py shell < benchmarks/login_throughput.py
+"""
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.test import Client, override_settings
+from django.urls import reverse
+from app.models import User
+
+
+PASSWORD = "login-benchmark-password"
+LOGINS = 40
+CONCURRENCY = 8
+PROBES = 200
+HASHERS = {
+    "pbkdf2 1M": {"PASSWORD_HASHER": "pbkdf2", "PBKDF2_ITERATIONS": 1_000_000},
+    "pbkdf2 600k": {"PASSWORD_HASHER": "pbkdf2", "PBKDF2_ITERATIONS": 600_000},
+    "argon2 t2 m100M p8": {"PASSWORD_HASHER": "argon2"},
+    "argon2 t2 m19M p1": {
+        "PASSWORD_HASHER": "argon2",
+        "ARGON2_MEMORY_COST": 19456,
+        "ARGON2_PARALLELISM": 1,
+    },
+}
+POOLS = ("none", "thread", "process")
+
+
+def hasher_settings(hasher, **params):
+    # The other hashers stay listed to verify, and so rehash, the old hash
+    classes = dict(settings.PASSWORD_HASHER_CLASSES)
+    preferred = classes.pop(hasher)
+    return {"PASSWORD_HASHERS": [preferred, *classes.values()], **params}
+
+
+def create_user():
+    User.objects.filter(username="login-benchmark").delete()
+    return User.objects.create_user(
+        username="login-benchmark",
+        email="login-benchmark@example.com",
+        password=PASSWORD,
+    )
+
+
+def login(i):
+    response = Client().post(
+        "/api/users/login/",
+        {"email": "login-benchmark@example.com", "password": PASSWORD},
+        content_type="application/json",
+    )
+    assert response.status_code == 200, response.status_code
+
+
+def login_burst():
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as executor:
+        list(executor.map(login, range(LOGINS)))
+    return time.perf_counter() - started
+
+
+def probe_latency(stop):
+    client = Client()
+    latencies = []
+    while not stop.is_set() and len(latencies) < PROBES:
+        started = time.perf_counter()
+        client.get(reverse("plan-list"))
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def measure_hashers(cores):
+    print(f"Login throughput, {LOGINS} logins from {CONCURRENCY} threads")
+    for label, params in HASHERS.items():
+        params = dict(params)
+        hasher = params.pop("PASSWORD_HASHER")
+        with override_settings(**hasher_settings(hasher, **params)):
+            # The first login rehashes the password with these parameters
+            login(0)
+            elapsed = login_burst()
+        print(
+            f"  {label:>20}: {LOGINS / elapsed:7.1f} logins/s, "
+            f"{LOGINS / elapsed / cores:7.1f} logins/s/core"
+        )
+
+
+def measure_responsiveness():
+    print(f"GET {reverse('plan-list')} while logins run ({CONCURRENCY} threads)")
+    idle = probe_latency(threading.Event())
+    print(f"  {'idle':>20}: p50 {statistics.median(idle) * 1000:7.2f} ms")
+    for pool in POOLS:
+        with override_settings(PASSWORD_HASH_POOL=pool):
+            login(0)
+            stop = threading.Event()
+            with ThreadPoolExecutor(1) as executor:
+                probes = executor.submit(probe_latency, stop)
+                elapsed = login_burst()
+                stop.set()
+                latencies = probes.result()
+        latencies.sort()
+        print(
+            f"  {'hashing ' + pool:>20}: p50 {statistics.median(latencies) * 1000:7.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f} ms, "
+            f"{LOGINS / elapsed:5.1f} logins/s"
+        )
+
+
+def run_benchmark():
+    cores = len(os.sched_getaffinity(0))
+    print(f"{cores} cores")
+    user = create_user()
+    try:
+        measure_hashers(cores)
+        measure_responsiveness()
+    finally:
+        user.delete()
+
+
+run_benchmark()
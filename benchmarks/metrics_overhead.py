@@ -0,0 +1,77 @@
+"""
+Request overhead of the metrics middleware and query recorder: median latency
+of a cheap and a DB-heavy endpoint through the full middleware stack with
+metrics disabled, at the default sample rate and with every request sampled.
+
+Run with: python manage.py shell < benchmarks/metrics_overhead.py
+"""
+import statistics
+import time
+from django.test import Client, override_settings
+from app.models import User, Plan, Subscription, Invoice
+
+
+INVOICE_COUNT = 50
+REQUESTS = 200
+ROUNDS = 5
+MODES = {
+    "disabled": {"METRICS_ENABLED": False},
+    "sample 10%": {"METRICS_ENABLED": True, "METRICS_SAMPLE_RATE": 0.1},
+    "sample 100%": {"METRICS_ENABLED": True, "METRICS_SAMPLE_RATE": 1.0},
+}
+ENDPOINTS = ("/api/users/profile/", "/api/billing/invoices/")
+
+
+def create_user():
+    User.objects.filter(username="metrics-benchmark").delete()
+    user = User.objects.create(
+        username="metrics-benchmark", email="metrics-benchmark@example.com"
+    )
+    plan = Plan.objects.order_by("price").first()
+    subscription = Subscription.objects.create(user=user, plan=plan, status="active")
+    Invoice.objects.bulk_create(
+        Invoice(
+            user=user,
+            subscription=subscription,
+            plan=plan,
+            amount=plan.price,
+            due_date=subscription.start_date,
+        )
+        for _ in range(INVOICE_COUNT)
+    )
+    return user
+
+
+def measure(client, path, overrides):
+    with override_settings(**overrides):
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            client.get(path)
+        return (time.perf_counter() - started) / REQUESTS
+
+
+def run_benchmark():
+    user = create_user()
+    client = Client()
+    client.force_login(user)
+    try:
+        for path in ENDPOINTS:
+            # Modes are interleaved round by round so drift affects them alike
+            timings = {mode: [] for mode in MODES}
+            for _ in range(ROUNDS):
+                for mode, overrides in MODES.items():
+                    timings[mode].append(measure(client, path, overrides))
+
+            baseline = statistics.median(timings["disabled"])
+            print(path)
+            for mode, values in timings.items():
+                latency = statistics.median(values)
+                print(
+                    f"  {mode:>12}: {latency * 1000:7.3f} ms/request, "
+                    f"{(latency / baseline - 1) * 100:+5.1f}%"
+                )
+    finally:
+        user.delete()
+
+
+run_benchmark()
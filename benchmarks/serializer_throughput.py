@@ -0,0 +1,89 @@
+"""
+Serialization throughput of the billing serializers with and without the
+fast read path.
+
+Run with: python manage.py shell < benchmarks/serializer_throughput.py
+"""
+import time
+import uuid
+from datetime import timedelta
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from app.models import User, Plan, Subscription, Invoice
+from app.billing.serializers import SubscriptionSerializer, InvoiceSerializer
+
+
+OBJECT_COUNT = 5000
+ROUNDS = 5
+
+
+def build_objects():
+    now = timezone.now()
+    plan = Plan(
+        id=uuid.uuid4(),
+        name="Pro",
+        plan_type="pro",
+        price="19.99",
+        features=["All Basic features", "Feature 3", "Feature 4"],
+        created_at=now,
+        updated_at=now,
+    )
+    subscriptions, invoices = [], []
+    for index in range(OBJECT_COUNT):
+        user = User(
+            id=index + 1, username=f"user{index}", email=f"user{index}@example.com"
+        )
+        subscription = Subscription(
+            id=uuid.uuid4(),
+            user=user,
+            plan=plan,
+            status="active",
+            start_date=now,
+            next_billing_date=now + timedelta(days=30),
+            created_at=now,
+            updated_at=now,
+        )
+        invoice = Invoice(
+            id=uuid.uuid4(),
+            user=user,
+            subscription=subscription,
+            plan=plan,
+            amount=plan.price,
+            issue_date=now,
+            due_date=now + timedelta(days=30),
+            created_at=now,
+            updated_at=now,
+        )
+        subscriptions.append(subscription)
+        invoices.append(invoice)
+    return subscriptions, invoices
+
+
+def measure(serializer_class, objects, fast):
+    with override_settings(FAST_READ_SERIALIZERS=fast):
+        best = None
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            data = serializer_class(objects, many=True).data
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return JSONRenderer().render(data), len(objects) / best
+
+
+def run_benchmark():
+    subscriptions, invoices = build_objects()
+    for serializer_class, objects in (
+        (SubscriptionSerializer, subscriptions),
+        (InvoiceSerializer, invoices),
+    ):
+        slow_json, slow_rate = measure(serializer_class, objects, fast=False)
+        fast_json, fast_rate = measure(serializer_class, objects, fast=True)
+        assert slow_json == fast_json, "fast read path changed the rendered JSON"
+        print(
+            f"{serializer_class.__name__}: {slow_rate:,.0f} obj/s -> "
+            f"{fast_rate:,.0f} obj/s ({fast_rate / slow_rate:.1f}x)"
+        )
+
+
+run_benchmark()
@@ -0,0 +1,124 @@
+"""
+Session read and write latency of each SESSION_STORE, the latency and DB
+queries of a session-authenticated request with it, and the throughput of
+the batched expired-session sweep.
+
+Uses the configured sessions cache, e.g. SESSION_CACHE_URL=locmem:// or a
+local Redis.
+
+Run with: python manage.py shell < benchmarks/session_latency.py
+"""
+import time
+from datetime import timedelta
+from importlib import import_module
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from app.models import User
+from app.users.sessions import purge_expired_sessions
+
+
+STORES = ("db", "cached_db", "cache", "signed_cookies")
+OPERATIONS = 1000
+REQUESTS = 300
+EXPIRED_SESSIONS = 20000
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def timed(operation, count):
+    durations = []
+    for i in range(count):
+        started = time.perf_counter()
+        operation(i)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def report(label, durations):
+    print(
+        f"  {label:>20}: p50 {percentile(durations, 0.5) * 1000:6.3f} ms, "
+        f"p95 {percentile(durations, 0.95) * 1000:6.3f} ms"
+    )
+
+
+def measure_store(store, user):
+    session_store = import_module(
+        f"django.contrib.sessions.backends.{store}"
+    ).SessionStore
+    session = session_store()
+    session["_auth_user_id"] = str(user.pk)
+    session.save()
+    key = session.session_key
+
+    def read(i):
+        session_store(key).load()
+
+    def write(i):
+        session = session_store(key)
+        session["counter"] = i
+        session.save()
+
+    report("read", timed(read, OPERATIONS))
+    report("write", timed(write, OPERATIONS))
+    session_store(key).delete()
+
+
+def measure_request(user):
+    client = Client()
+    client.force_login(user)
+    durations = timed(lambda i: client.get("/api/users/profile/"), REQUESTS)
+    with CaptureQueriesContext(connection) as queries:
+        client.get("/api/users/profile/")
+    report(f"request, {len(queries)} queries", durations)
+
+
+def measure_sweep():
+    expired = timezone.now() - timedelta(days=1)
+    Session.objects.bulk_create(
+        Session(
+            session_key=f"expired{i:033d}",
+            session_data="",
+            expire_date=expired,
+        )
+        for i in range(EXPIRED_SESSIONS)
+    )
+    started = time.perf_counter()
+    with override_settings(SESSION_STORE="db"):
+        purged = purge_expired_sessions()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Swept {purged} expired sessions in {elapsed:.2f}s "
+        f"({purged / elapsed:.0f} rows/s)"
+    )
+
+
+def run_benchmark():
+    User.objects.filter(username="session-benchmark").delete()
+    user = User.objects.create_user(
+        username="session-benchmark",
+        email="session-benchmark@example.com",
+        password="session-benchmark-password",
+    )
+    print(f"Sessions cache: {caches['sessions'].__class__.__name__}")
+    try:
+        for store in STORES:
+            with override_settings(
+                SESSION_STORE=store,
+                SESSION_ENGINE=f"django.contrib.sessions.backends.{store}",
+            ):
+                print(store)
+                measure_store(store, user)
+                measure_request(user)
+        measure_sweep()
+    finally:
+        user.delete()
+
+
+run_benchmark()
@@ -0,0 +1,78 @@
+"""
+Stripe gateway behaviour against the local fake Stripe server: latency of a
+healthy Stripe, per-call timeouts against a slow one, fail-fast once the
+circuit breaker opens on a failing one, and recovery through the half-open
+probe.
+
+Requires uvicorn (see requirements.txt).
+Run with: python manage.py shell < benchmarks/stripe_gateway_resilience.py
+"""
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.test import override_settings
+from app.billing import stripe_gateway
+from benchmarks import fake_stripe
+
+
+PORT = 12112
+CALLS = 50
+THREADS = 8
+TIMEOUT = 0.5
+RESET_TIMEOUT = 1.0
+
+
+def call(_):
+    started = time.perf_counter()
+    try:
+        stripe_gateway.create_customer(
+            email="gateway@example.com", name="gateway", timeout=TIMEOUT
+        )
+        outcome = "ok"
+    except stripe_gateway.CircuitOpenError:
+        outcome = "circuit_open"
+    except stripe_gateway.StripeGatewayError as e:
+        outcome = "timeout" if "timed out" in str(e) else "error"
+    return outcome, (time.perf_counter() - started) * 1000
+
+
+def scenario(label, latency=0.0, status=200):
+    server = fake_stripe.start(PORT, latency=latency, status=status)
+    try:
+        stripe_gateway.reset_clients()
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            results = list(executor.map(call, range(CALLS)))
+    finally:
+        fake_stripe.stop(server)
+
+    print(f"{label} (circuit now {stripe_gateway.breaker.state})")
+    for outcome in sorted({outcome for outcome, _ in results}):
+        latencies = [ms for name, ms in results if name == outcome]
+        print(
+            f"  {outcome:>12}: {len(latencies):3d} calls, "
+            f"median {statistics.median(latencies):7.1f} ms, "
+            f"max {max(latencies):7.1f} ms"
+        )
+
+
+def run_benchmark():
+    stripe_gateway.breaker.reset_timeout = RESET_TIMEOUT
+    with override_settings(
+        STRIPE_API_BASE=f"http://127.0.0.1:{PORT}",
+        STRIPE_SECRET_KEY="sk_test_benchmark",
+        STRIPE_RETRY_BACKOFF=0.05,
+    ):
+        scenario("Healthy Stripe, 50 ms latency", latency=0.05)
+        scenario(f"Slow Stripe, 2 s latency, {TIMEOUT} s timeout", latency=2.0)
+        time.sleep(RESET_TIMEOUT)
+        scenario("Failing Stripe, HTTP 503", status=503)
+        time.sleep(RESET_TIMEOUT)
+        scenario("Recovered Stripe, probe after the reset timeout", latency=0.05)
+
+    for operation, histogram in stripe_gateway.gateway_stats()["latency"].items():
+        print(f"{operation}: {histogram['count']} calls, {histogram['outcomes']}")
+        for bound, count in histogram["buckets"].items():
+            print(f"  le {bound:>5}: {count}")
+
+
+run_benchmark()
@@ -0,0 +1,136 @@
+"""
+Multi-threaded load test of the subscribe and pay endpoints under contention.
+Every user is hit by several concurrent subscribe requests and every open
+invoice by several concurrent payments; afterwards each user must have exactly
+one active subscription and each invoice must have been paid exactly once.
+
+Run with: python manage.py shell < benchmarks/subscription_contention.py
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from django.db.models import Count
+from rest_framework.test import APIRequestFactory, force_authenticate
+from app.models import User, Plan, Subscription, Invoice
+from app.billing.views import subscribe_to_plan, pay_invoice
+
+
+THREADS = 16
+USER_COUNT = 50
+ATTEMPTS_PER_TARGET = 8
+USERNAME_PREFIX = "contention-"
+
+factory = APIRequestFactory()
+
+
+def create_users():
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+    return User.objects.bulk_create(
+        [
+            User(
+                username=f"{USERNAME_PREFIX}{index}",
+                email=f"{USERNAME_PREFIX}{index}@example.com",
+            )
+            for index in range(USER_COUNT)
+        ]
+    )
+
+
+def call(view, user, path, data=None, view_kwargs=None):
+    request = factory.post(path, data or {}, format="json")
+    force_authenticate(request, user=user)
+    try:
+        return view(request, **(view_kwargs or {})).status_code
+    finally:
+        connections.close_all()
+
+
+def hammer(label, calls):
+    """
+    Run every call on the thread pool and report throughput and status codes
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        statuses = list(executor.map(lambda args: call(*args), calls))
+    elapsed = time.perf_counter() - started
+
+    counts = {code: statuses.count(code) for code in sorted(set(statuses))}
+    print(
+        f"{label}: {len(calls)} requests in {elapsed:.2f}s "
+        f"({len(calls) / elapsed:.0f} req/s), status codes {counts}"
+    )
+    return counts
+
+
+def check(condition, message):
+    """
+    Fail the run when contention broke an invariant
+    """
+    if not condition:
+        raise AssertionError(message)
+
+
+def check_subscriptions(users):
+    per_user = dict(
+        Subscription.objects.filter(user__in=users, status="active")
+        .values_list("user")
+        .annotate(count=Count("id"))
+    )
+    duplicated = {user_id: n for user_id, n in per_user.items() if n > 1}
+    missing = len(users) - len(per_user)
+    print(
+        f"  {sum(per_user.values())} active subscriptions for {len(users)} users, "
+        f"max per user {max(per_user.values(), default=0)}"
+    )
+    check(not duplicated, f"Users with several active subscriptions: {duplicated}")
+    check(not missing, f"{missing} users have no active subscription")
+
+
+def check_payments(invoices, counts):
+    payments = counts.get(200, 0)
+    paid = Invoice.objects.filter(
+        id__in=[invoice.id for invoice in invoices], status="paid"
+    ).count()
+    print(f"  {payments} successful payments for {len(invoices)} invoices, {paid} paid")
+    check(
+        payments == len(invoices),
+        f"{payments} successful payments for {len(invoices)} invoices",
+    )
+    check(paid == len(invoices), f"{len(invoices) - paid} invoices left unpaid")
+
+
+def run_benchmark():
+    plan = Plan.objects.filter(is_active=True).order_by("price").first()
+    if plan is None:
+        print("Populate the plans first (initial_script/populate_plans.py)")
+        return
+    users = create_users()
+
+    try:
+        subscribe_calls = [
+            (subscribe_to_plan, user, "/billing/subscribe/", {"plan": str(plan.id)})
+            for user in users
+            for _ in range(ATTEMPTS_PER_TARGET)
+        ]
+        hammer("subscribe", subscribe_calls)
+        check_subscriptions(users)
+
+        invoices = list(Invoice.objects.filter(user__in=users).select_related("user"))
+        pay_calls = [
+            (
+                pay_invoice,
+                invoice.user,
+                f"/billing/invoices/{invoice.id}/pay/",
+                None,
+                {"invoice_id": invoice.id},
+            )
+            for invoice in invoices
+            for _ in range(ATTEMPTS_PER_TARGET)
+        ]
+        counts = hammer("pay", pay_calls)
+        check_payments(invoices, counts)
+    finally:
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+
+run_benchmark()
@@ -0,0 +1,298 @@
+"""
+Synthetic billing data for the benchmarks: users, subscriptions, invoices,
+payment reminders and Stripe webhook events with production-like
+distributions, written with bulk inserts in chunks of users.
+
+- Signups grow over HISTORY_DAYS, so recent months have the most users.
+- Users signed up within the last PROVISION_BACKLOG have no Stripe customer
+  yet, as if the provisioning job had not reached them.
+- Plans are spread 60/30/10 over basic, pro and enterprise. A quarter of the
+  users churned once and resubscribed.
+- Every elapsed billing period has an invoice. Most past ones are paid. A
+  few are failed, overdue (with reminders), or past due but not yet marked
+  overdue.
+- Active subscriptions come due spread over the billing cycle, so about one
+  in thirty is due today.
+"""
+import random
+import uuid
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from app.models import (
+    User,
+    Plan,
+    Subscription,
+    Invoice,
+    PaymentReminder,
+    StripeWebhookEvent,
+    ProcessedStripeEvent,
+)
+from app.billing.invoicing import BILLING_CYCLE_DAYS, day_bounds
+
+
+USERNAME_PREFIX = "synthetic-"
+PASSWORD = "synthetic-password-1"
+CHUNK_SIZE = 2000
+HISTORY_DAYS = 730
+PROVISION_BACKLOG = timedelta(hours=1)
+MAX_INVOICES_PER_SUBSCRIPTION = 24
+CHURN_RATE = 0.25
+
+PLANS = (
+    ("Basic", "basic", "9.99", ["Feature 1", "Feature 2"]),
+    ("Pro", "pro", "19.99", ["All Basic features", "Feature 3", "Feature 4"]),
+    (
+        "Enterprise",
+        "enterprise",
+        "49.99",
+        ["All Pro features", "Feature 5", "Premium support"],
+    ),
+)
+PLAN_WEIGHTS = {"basic": 60, "pro": 30, "enterprise": 10}
+SUBSCRIPTION_STATUS_WEIGHTS = {
+    "active": 72,
+    "cancelled": 18,
+    "expired": 7,
+    "pending": 3,
+}
+PAST_INVOICE_STATUS_WEIGHTS = {"paid": 94, "failed": 1, "overdue": 3, "pending": 2}
+# Pending invoices with a paid/failed webhook waiting in the inbox, and
+# processed event records, as shares of the user count
+INBOX_EVENTS_PER_USER = 0.01
+PROCESSED_EVENTS_PER_USER = 0.05
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def ensure_plans():
+    """
+    The three plans of initial_script/populate_plans.py, keyed by plan type
+    """
+    for name, plan_type, price, features in PLANS:
+        Plan.objects.get_or_create(
+            plan_type=plan_type,
+            defaults={"name": name, "price": price, "features": features},
+        )
+    return {plan.plan_type: plan for plan in Plan.objects.all()}
+
+
+def billing_dates(start, period, until):
+    """
+    Issue dates of the periods started before `until`, the first one being
+    issued at subscription time, and the next billing date after them
+    """
+    dates, issue_date = [start], start + period
+    while issue_date < until:
+        dates.append(issue_date)
+        issue_date += period
+    return dates[-MAX_INVOICES_PER_SUBSCRIPTION:], issue_date
+
+
+def build_subscription(rng, user, plan, status, start, end, now):
+    period = timedelta(days=BILLING_CYCLE_DAYS[plan.billing_cycle])
+    # Running subscriptions are billed up to the start of today, leaving
+    # today's renewals to the billing run
+    until = day_bounds(timezone.localdate(now))[0] if end is None else end
+    if status == "pending":
+        issue_dates, next_billing_date = [], start + period
+    else:
+        issue_dates, next_billing_date = billing_dates(start, period, until)
+
+    subscription = Subscription(
+        user=user,
+        plan=plan,
+        status=status,
+        start_date=start,
+        end_date=end,
+        next_billing_date=next_billing_date,
+        stripe_subscription_id=f"sub_{uuid.uuid4().hex[:24]}",
+    )
+
+    invoices = []
+    for issue_date in issue_dates:
+        due_date = issue_date + timedelta(days=30)
+        if due_date > now:
+            invoice_status = "pending"
+        else:
+            invoice_status = weighted_choice(rng, PAST_INVOICE_STATUS_WEIGHTS)
+        invoices.append(
+            Invoice(
+                user=user,
+                subscription=subscription,
+                plan=plan,
+                amount=plan.price,
+                issue_date=issue_date,
+                due_date=due_date,
+                paid_date=(
+                    issue_date + timedelta(hours=rng.uniform(0, 72))
+                    if invoice_status == "paid"
+                    else None
+                ),
+                status=invoice_status,
+                stripe_invoice_id=f"in_{uuid.uuid4().hex[:24]}",
+            )
+        )
+    return subscription, invoices
+
+
+def build_reminders(rng, invoices, now):
+    reminders = []
+    for invoice in invoices:
+        if invoice.status != "overdue":
+            continue
+        days_overdue = max((now - invoice.due_date).days, 1)
+        for _ in range(rng.randint(1, 3)):
+            reminders.append(
+                PaymentReminder(
+                    invoice=invoice,
+                    sent_date=invoice.due_date
+                    + timedelta(days=rng.randint(1, days_overdue)),
+                    reminder_type="payment_overdue",
+                    email_sent=True,
+                )
+            )
+    return reminders
+
+
+def build_users(rng, first_index, count, password, now):
+    users = []
+    for index in range(first_index, first_index + count):
+        # Squaring skews signups towards the recent end of the history
+        signup = now - timedelta(days=HISTORY_DAYS * rng.random() ** 2)
+        users.append(
+            User(
+                username=f"{USERNAME_PREFIX}{index}",
+                email=f"{USERNAME_PREFIX}{index}@example.com",
+                password=password,
+                date_joined=signup,
+                stripe_customer_id=(
+                    "" if now - signup < PROVISION_BACKLOG else f"cus_synthetic{index}"
+                ),
+            )
+        )
+    return users
+
+
+def build_chunk(rng, users, plans, now):
+    plan_list = [plans[plan_type] for plan_type in PLAN_WEIGHTS]
+    plan_weights = list(PLAN_WEIGHTS.values())
+    subscriptions, invoices = [], []
+
+    for user in users:
+        start = user.date_joined + timedelta(hours=rng.uniform(0, 72))
+        start = min(start, now)
+        if rng.random() < CHURN_RATE and now - start > timedelta(days=60):
+            churned_at = start + (now - start) * rng.uniform(0.2, 0.8)
+            subscription, subscription_invoices = build_subscription(
+                rng,
+                user,
+                rng.choices(plan_list, weights=plan_weights)[0],
+                "cancelled",
+                start,
+                churned_at,
+                now,
+            )
+            subscriptions.append(subscription)
+            invoices.extend(subscription_invoices)
+            start = churned_at + timedelta(days=rng.uniform(1, 14))
+
+        status = weighted_choice(rng, SUBSCRIPTION_STATUS_WEIGHTS)
+        end = None
+        if status in ("cancelled", "expired"):
+            end = start + (now - start) * rng.uniform(0.3, 1.0)
+        subscription, subscription_invoices = build_subscription(
+            rng,
+            user,
+            rng.choices(plan_list, weights=plan_weights)[0],
+            status,
+            start,
+            end,
+            now,
+        )
+        subscriptions.append(subscription)
+        invoices.extend(subscription_invoices)
+
+    return subscriptions, invoices
+
+
+def build_events(rng, invoices, user_count, now):
+    """
+    Pending inbox events settling some open invoices, and processed event
+    records spread over twice the dedup window so about half are purgeable
+    """
+    open_invoices = [
+        invoice for invoice in invoices if invoice.status in ("pending", "overdue")
+    ]
+    inbox_count = min(len(open_invoices), round(user_count * INBOX_EVENTS_PER_USER))
+    inbox = []
+    for invoice in rng.sample(open_invoices, inbox_count):
+        event_type = rng.choices(
+            ["invoice.payment_succeeded", "invoice.payment_failed"], weights=[9, 1]
+        )[0]
+        event_id = f"evt_{uuid.uuid4().hex[:24]}"
+        inbox.append(
+            StripeWebhookEvent(
+                event_id=event_id,
+                event_type=event_type,
+                payload={
+                    "id": event_id,
+                    "type": event_type,
+                    "data": {"object": {"id": invoice.stripe_invoice_id}},
+                },
+            )
+        )
+
+    processed = [
+        ProcessedStripeEvent(
+            event_id=f"evt_{uuid.uuid4().hex[:24]}",
+            batch_token=uuid.uuid4(),
+            processed_at=now - timedelta(days=rng.uniform(0, 14)),
+        )
+        for _ in range(round(user_count * PROCESSED_EVENTS_PER_USER))
+    ]
+    return inbox, processed
+
+
+def generate(user_count, seed=0, chunk_size=CHUNK_SIZE):
+    """
+    Add `user_count` synthetic users with their billing history. Every user
+    gets the password PASSWORD. Returns the number of rows written per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    plans = ensure_plans()
+    # One hash for every user, hashing millions of passwords would dominate
+    password = make_password(PASSWORD)
+    first_index = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    counts = dict.fromkeys(
+        ["users", "subscriptions", "invoices", "reminders", "inbox", "processed"], 0
+    )
+
+    for offset in range(0, user_count, chunk_size):
+        count = min(chunk_size, user_count - offset)
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                build_users(rng, first_index + offset, count, password, now)
+            )
+            subscriptions, invoices = build_chunk(rng, users, plans, now)
+            Subscription.objects.bulk_create(subscriptions)
+            Invoice.objects.bulk_create(invoices)
+            reminders = PaymentReminder.objects.bulk_create(
+                build_reminders(rng, invoices, now)
+            )
+            inbox, processed = build_events(rng, invoices, count, now)
+            StripeWebhookEvent.objects.bulk_create(inbox)
+            ProcessedStripeEvent.objects.bulk_create(processed)
+
+        counts["users"] += len(users)
+        counts["subscriptions"] += len(subscriptions)
+        counts["invoices"] += len(invoices)
+        counts["reminders"] += len(reminders)
+        counts["inbox"] += len(inbox)
+        counts["processed"] += len(processed)
+
+    return counts
@@ -1,4 +1,6 @@
+import copy
 import os
+import sys
 from decouple import config
 
 
@@ -12,6 +14,16 @@ SECRET_KEY = os.getenv(
     "sumit",
 )
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+STRIPE_WEBHOOK_TOLERANCE = int(os.getenv("STRIPE_WEBHOOK_TOLERANCE", 300))
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", 10))
+STRIPE_MAX_CONNECTIONS = int(os.getenv("STRIPE_MAX_CONNECTIONS", 100))
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", 2))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", 1))
+STRIPE_RETRY_BACKOFF = float(os.getenv("STRIPE_RETRY_BACKOFF", 0.25))
+STRIPE_BREAKER_THRESHOLD = int(os.getenv("STRIPE_BREAKER_THRESHOLD", 5))
+STRIPE_BREAKER_RESET_TIMEOUT = float(os.getenv("STRIPE_BREAKER_RESET_TIMEOUT", 30))
 
 
 # Base settings
@@ -32,6 +44,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 ##
 ROOT_URLCONF = "saas_project.urls"
 WSGI_APPLICATION = "saas_project.wsgi.application"
+ASGI_APPLICATION = "saas_project.asgi.application"
+# Serve the I/O-bound billing endpoints with their async views (set when
+# running under ASGI, see scripts/start_server.sh)
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
 
 
 ## Accept request from any host
@@ -54,12 +70,14 @@ INSTALLED_APPS = [
 
 ## Middleware
 MIDDLEWARE = [
+    "app.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "app.db_router.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -107,23 +125,173 @@ DATABASES = {
             "DB_PORT",
             default=5432,
         ),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# DB_ENGINE=sqlite runs on a local SQLite file instead, for benchmarks and
+# development without Postgres. The migrations build their indexes
+# concurrently, which only Postgres supports, so SQLite gets its schema
+# straight from the models (python manage.py migrate --run-syncdb).
+DB_ENGINE = os.getenv("DB_ENGINE", "postgresql")
+if DB_ENGINE == "sqlite":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", os.path.join(BASE_DIR, "db.sqlite3")),
+    }
+    MIGRATION_MODULES = {"app": None}
+
+
+## Database connection pooling
+# PROCESS_TYPE (web | worker) picks the pool sizing of the running process and
+# DB_POOL_MODE chooses between a psycopg pool, persistent connections or neither
+PROCESS_TYPE = os.getenv("PROCESS_TYPE", "web")
+DB_POOL_MODE = os.getenv(
+    "DB_POOL_MODE", "pool" if DB_ENGINE == "postgresql" else "none"
+)
+DB_POOL_SIZES = {
+    "web": {"min_size": 2, "max_size": 8},
+    "worker": {"min_size": 1, "max_size": 2},
+}
+
+if DB_POOL_MODE == "pool":
+    pool_size = DB_POOL_SIZES.get(PROCESS_TYPE, DB_POOL_SIZES["web"])
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", pool_size["min_size"])),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", pool_size["max_size"])),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+        }
+    }
+elif DB_POOL_MODE == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", 60))
+
+
+## Read replicas
+# DB_REPLICA_HOSTS is a comma separated list of replica hosts. Each one gets a
+# `replica_<n>` alias with the primary's settings; safe requests read from them
+# unless the user wrote within the last REPLICA_PIN_SECONDS.
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+DATABASE_REPLICAS = []
+for index, host in enumerate(DB_REPLICA_HOSTS):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# `manage.py test` gets a second database for the replica router tests. It is
+# not listed in DATABASE_REPLICAS, so reads only go to it in those tests.
+if sys.argv[1:2] == ["test"]:
+    DATABASES["test_replica"] = copy.deepcopy(DATABASES["default"])
+    if DB_ENGINE != "sqlite":
+        DATABASES["test_replica"]["TEST"] = {
+            "NAME": f"test_{DATABASES['default']['NAME']}_replica"
+        }
+
+DATABASE_ROUTERS = ["app.db_router.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+
+
+## Cache
+# CACHE_URL=locmem:// keeps the cache in process memory, for local runs
+# without Redis
+CACHE_URL = config(
+    "CACHE_URL",
+    default="redis://saas_cache:6379/0",
+)
+
+
+def cache_backend(url):
+    if url.startswith("locmem://"):
+        return {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": url.removeprefix("locmem://"),
+        }
+    return {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": url,
+    }
+
+
+# Sessions get their own cache, so clearing the default one does not log
+# everybody out; point SESSION_CACHE_URL at another Redis database or server
+SESSION_CACHE_URL = config("SESSION_CACHE_URL", default=CACHE_URL)
+CACHES = {
+    "default": cache_backend(CACHE_URL),
+    "sessions": cache_backend(SESSION_CACHE_URL),
+}
+
+
+## Sessions
+# SESSION_STORE is one of:
+#  - db: a django_session row read on every request
+#  - cached_db: read from the sessions cache, written through to the database
+#  - cache: the sessions cache only; sessions are lost if it is flushed
+#  - signed_cookies: the session data is the cookie, nothing is stored
+# Expired rows of the db stores are deleted in batches of
+# SESSION_PURGE_BATCH_SIZE every SESSION_PURGE_INTERVAL seconds.
+SESSION_STORE = os.getenv("SESSION_STORE", "cached_db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_STORE}"
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_PURGE_BATCH_SIZE = int(os.getenv("SESSION_PURGE_BATCH_SIZE", 1000))
+SESSION_PURGE_INTERVAL = float(os.getenv("SESSION_PURGE_INTERVAL", 60 * 60))
+
+
+## Email
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend",
+)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", 25))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = config("EMAIL_USE_TLS", default=False, cast=bool)
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", 10))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "billing@example.com")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 100))
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", 0))
+EMAIL_CONNECTION_MAX_AGE = int(os.getenv("EMAIL_CONNECTION_MAX_AGE", 300))
+
 
 # REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
+        "app.users.authentication.TokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "app.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
 }
 
 
+# Token authentication
+# Service clients get a signed token from POST /api/users/token/ and send it as
+# "Authorization: Bearer <token>". Tokens expire after AUTH_TOKEN_MAX_AGE
+# seconds; each process keeps up to AUTH_TOKEN_LRU_SIZE token users for
+# AUTH_TOKEN_CACHE_TTL seconds, which bounds how long a revocation or a
+# deactivation made by another process goes unseen.
+AUTH_TOKEN_MAX_AGE = int(os.getenv("AUTH_TOKEN_MAX_AGE", 60 * 60 * 24))
+AUTH_TOKEN_LRU_SIZE = int(os.getenv("AUTH_TOKEN_LRU_SIZE", 10000))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", 30))
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -139,3 +307,69 @@ AUTH_PASSWORD_VALIDATORS = [
         "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
     },
 ]
+
+
+# Password hashing
+# PASSWORD_HASHER (pbkdf2 | argon2) hashes new passwords. Hashes made with the
+# other hashers, or with cost parameters other than the ones below, still
+# verify and are rehashed on the user's next login.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", 1_000_000))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 102400))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 8))
+PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "app.users.hashers.PBKDF2PasswordHasher",
+    "argon2": "app.users.hashers.Argon2PasswordHasher",
+}
+# The first hasher hashes new passwords, the others only verify old hashes
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    *(
+        path
+        for name, path in PASSWORD_HASHER_CLASSES.items()
+        if name != PASSWORD_HASHER
+    ),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# Hashing runs in a PASSWORD_HASH_POOL (thread | process | none) of
+# PASSWORD_HASH_WORKERS workers (default: one per CPU) per web or worker process
+PASSWORD_HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 0))
+
+
+# Billing
+BILLING_CHUNK_SIZE = int(os.getenv("BILLING_CHUNK_SIZE", 1000))
+BILLING_SHARD_COUNT = int(os.getenv("BILLING_SHARD_COUNT", 16))
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 300))
+DASHBOARD_PENDING_INVOICES_LIMIT = int(
+    os.getenv("DASHBOARD_PENDING_INVOICES_LIMIT", 20)
+)
+FAST_READ_SERIALIZERS = config("FAST_READ_SERIALIZERS", default=True, cast=bool)
+PLAN_CATALOG_CHECK_INTERVAL = float(os.getenv("PLAN_CATALOG_CHECK_INTERVAL", 5))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", 500))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 500))
+WEBHOOK_DRAIN_INTERVAL = float(os.getenv("WEBHOOK_DRAIN_INTERVAL", 5))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 5))
+STRIPE_EVENT_LRU_SIZE = int(os.getenv("STRIPE_EVENT_LRU_SIZE", 100000))
+STRIPE_EVENT_DEDUP_TTL = int(os.getenv("STRIPE_EVENT_DEDUP_TTL", 60 * 60 * 24 * 7))
+ENTITLEMENT_LRU_SIZE = int(os.getenv("ENTITLEMENT_LRU_SIZE", 10000))
+ENTITLEMENT_LOCAL_TTL = float(os.getenv("ENTITLEMENT_LOCAL_TTL", 5))
+ENTITLEMENT_CACHE_TIMEOUT = int(os.getenv("ENTITLEMENT_CACHE_TIMEOUT", 300))
+STRIPE_PROVISION_BATCH_SIZE = int(os.getenv("STRIPE_PROVISION_BATCH_SIZE", 100))
+STRIPE_PROVISION_CONCURRENCY = int(os.getenv("STRIPE_PROVISION_CONCURRENCY", 8))
+STRIPE_PROVISION_INTERVAL = float(os.getenv("STRIPE_PROVISION_INTERVAL", 60))
+STRIPE_PROVISION_LOCK_TIMEOUT = int(os.getenv("STRIPE_PROVISION_LOCK_TIMEOUT", 60))
+
+
+# Metrics
+# Every request and task has its wall time recorded, and a METRICS_SAMPLE_RATE
+# share of them their DB and serialization time too. Each process publishes its
+# metrics to the cache every METRICS_PUBLISH_INTERVAL seconds and /metrics
+# serves the sum over all live web and worker processes. Set METRICS_TOKEN to
+# require "Authorization: Bearer <token>" on /metrics.
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", 0.1))
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", 15))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
@@ -1,5 +1,12 @@
 #!/bin/bash
+export PROCESS_TYPE=${PROCESS_TYPE:-web}
 python manage.py migrate &&
 python manage.py collectstatic --noinput &&
 python manage.py shell < initial_script/populate_plans.py
-gunicorn --bind 0.0.0.0:8000 saas_project.wsgi:application
\ No newline at end of file
+# SERVER_MODE=asgi serves the app with uvicorn workers and the async views
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    export ASYNC_VIEWS=${ASYNC_VIEWS:-true}
+    gunicorn --bind 0.0.0.0:8000 --worker-class uvicorn.workers.UvicornWorker --workers ${GUNICORN_WORKERS:-2} saas_project.asgi:application
+else
+    gunicorn --bind 0.0.0.0:8000 --worker-class gthread --workers ${GUNICORN_WORKERS:-2} --threads ${GUNICORN_THREADS:-8} saas_project.wsgi:application
+fi
\ No newline at end of file
@@ -1,2 +1,3 @@
 #!/bin/bash
+export PROCESS_TYPE=${PROCESS_TYPE:-worker}
 celery --app=app.celery.celery.saas_project_celery_app worker --queues=sheduled_tasks --without-gossip --concurrency=4 --loglevel=INFO --without-mingle --without-heartbeat -Ofair --hostname=beat_worker@%h --max-tasks-per-child=1000
\ No newline at end of file